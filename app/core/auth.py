@@ -6,13 +6,14 @@ from __future__ import annotations
 
 import asyncio
 import json
+import time
 from pathlib import Path
-from typing import Optional, Set
+from typing import FrozenSet, Optional, Set, Tuple
 
 from fastapi import HTTPException, Security, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
-from app.core.config import get_config
+from app.core.config import config, get_config
 
 # 定义 Bearer Scheme
 security = HTTPBearer(
@@ -25,6 +26,11 @@ LEGACY_API_KEYS_FILE = Path(__file__).parent.parent.parent / "data" / "api_keys.
 _legacy_api_keys_cache: Set[str] | None = None
 _legacy_api_keys_mtime: float | None = None
 _legacy_api_keys_lock = asyncio.Lock()
+# legacy keys 文件每秒最多 stat 一次
+_LEGACY_RECHECK_SECONDS = 1.0
+_legacy_api_keys_checked_at = 0.0
+# 可接受的 API Key 集合: (config.version, legacy keys 对象, 集合)
+_accepted_keys_cache: Tuple[int, Set[str], FrozenSet[str]] | None = None
 
 
 async def _load_legacy_api_keys() -> Set[str]:
@@ -34,12 +40,18 @@ async def _load_legacy_api_keys() -> Set[str]:
     Older versions stored multiple API keys in `data/api_keys.json` with a shape like:
     [{"key": "...", "is_active": true, ...}, ...]
     """
-    global _legacy_api_keys_cache, _legacy_api_keys_mtime
+    global _legacy_api_keys_cache, _legacy_api_keys_mtime, _legacy_api_keys_checked_at
+
+    now = time.monotonic()
+    if _legacy_api_keys_cache is not None and now - _legacy_api_keys_checked_at < _LEGACY_RECHECK_SECONDS:
+        return _legacy_api_keys_cache
+    _legacy_api_keys_checked_at = now
 
     if not LEGACY_API_KEYS_FILE.exists():
-        _legacy_api_keys_cache = set()
+        if _legacy_api_keys_cache is None or _legacy_api_keys_cache:
+            _legacy_api_keys_cache = set()
         _legacy_api_keys_mtime = None
-        return set()
+        return _legacy_api_keys_cache
 
     try:
         stat = LEGACY_API_KEYS_FILE.stat()
@@ -53,9 +65,10 @@ async def _load_legacy_api_keys() -> Set[str]:
     async with _legacy_api_keys_lock:
         # Re-check in lock
         if not LEGACY_API_KEYS_FILE.exists():
-            _legacy_api_keys_cache = set()
+            if _legacy_api_keys_cache is None or _legacy_api_keys_cache:
+                _legacy_api_keys_cache = set()
             _legacy_api_keys_mtime = None
-            return set()
+            return _legacy_api_keys_cache
 
         try:
             stat = LEGACY_API_KEYS_FILE.stat()
@@ -87,6 +100,20 @@ async def _load_legacy_api_keys() -> Set[str]:
         return keys
 
 
+def _accepted_api_keys(legacy_keys: Set[str]) -> FrozenSet[str]:
+    """app.api_key 与 legacy keys 的合集，按配置版本和 legacy keys 对象缓存"""
+    global _accepted_keys_cache
+
+    cached = _accepted_keys_cache
+    if cached is not None and cached[0] == config.version and cached[1] is legacy_keys:
+        return cached[2]
+
+    api_key = str(get_config("app.api_key", "") or "").strip()
+    keys = frozenset(legacy_keys | {api_key}) if api_key else frozenset(legacy_keys)
+    _accepted_keys_cache = (config.version, legacy_keys, keys)
+    return keys
+
+
 async def verify_api_key(
     auth: Optional[HTTPAuthorizationCredentials] = Security(security),
 ) -> Optional[str]:
@@ -96,11 +123,10 @@ async def verify_api_key(
     - 若 `app.api_key` 未配置且不存在 legacy keys，则跳过验证。
     - 若配置了 `app.api_key` 或存在 legacy keys，则必须提供 Authorization: Bearer <key>。
     """
-    api_key = str(get_config("app.api_key", "") or "").strip()
-    legacy_keys = await _load_legacy_api_keys()
+    accepted_keys = _accepted_api_keys(await _load_legacy_api_keys())
 
     # 如果未配置 API Key 且没有 legacy keys，直接放行
-    if not api_key and not legacy_keys:
+    if not accepted_keys:
         return None
 
     if not auth:
@@ -111,7 +137,7 @@ async def verify_api_key(
         )
 
     token = auth.credentials
-    if (api_key and token == api_key) or token in legacy_keys:
+    if token in accepted_keys:
         return token
 
     raise HTTPException(
@@ -224,8 +224,23 @@ class Config:
 
     def __init__(self):
         self._config = {}
+        # "section.key" -> 值 的扁平索引，随 _config 一起替换
+        self._flat: Dict[str, Any] = {}
         self._defaults = {}
         self._defaults_loaded = False
+        # 配置版本号，每次加载/更新后递增，供调用方缓存解析结果
+        self.version = 0
+
+    def _set_config(self, data: dict):
+        """替换当前配置并重建扁平索引"""
+        flat: Dict[str, Any] = {}
+        for section, values in data.items():
+            flat[section] = values
+            if isinstance(values, dict):
+                for attr, value in values.items():
+                    flat[f"{section}.{attr}"] = value
+        self._config = data
+        self._flat = flat
 
     def _ensure_defaults(self):
         if self._defaults_loaded:
@@ -282,10 +297,11 @@ class Config:
                         f"Initialized remote storage ({storage.__class__.__name__}) with config baseline."
                     )
 
-            self._config = merged
+            self._set_config(merged)
         except Exception as e:
             logger.error(f"Error loading config: {e}")
-            self._config = {}
+            self._set_config({})
+        self.version += 1
 
     def get(self, key: str, default: Any = None) -> Any:
         """
@@ -295,14 +311,7 @@ class Config:
             key: 配置键，格式 "section.key"
             default: 默认值
         """
-        if "." in key:
-            try:
-                section, attr = key.split(".", 1)
-                return self._config.get(section, {}).get(attr, default)
-            except (ValueError, AttributeError):
-                return default
-
-        return self._config.get(key, default)
+        return self._flat.get(key, default)
 
     async def update(self, new_config: dict):
         """更新配置"""
@@ -314,7 +323,8 @@ class Config:
             base = _deep_merge(self._defaults, self._config or {})
             merged = _deep_merge(base, new_config or {})
             await storage.save_config(merged)
-            self._config = merged
+            self._set_config(merged)
+            self.version += 1
 
 
 # 全局配置实例
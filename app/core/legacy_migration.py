@@ -123,11 +123,15 @@ __all__ = ["migrate_legacy_cache_dirs", "migrate_legacy_account_settings"]
 async def migrate_legacy_account_settings(
     concurrency: int = 10,
     data_dir: Path | None = None,
+    ready: asyncio.Event | None = None,
+    ready_timeout: float = 10.0,
 ) -> Dict[str, Any]:
     """
     After legacy data migration, run a one-time TOS + NSFW enablement for existing accounts.
 
     This is best-effort and guarded by a cross-process lock + done marker.
+    If ``ready`` is given, the bulk phase waits for it (at most ``ready_timeout``
+    seconds) so startup traffic is served first.
     """
 
     data_root = data_dir or (Path(__file__).parent.parent.parent / "data")
@@ -229,24 +233,26 @@ async def migrate_legacy_account_settings(
             )
             return bool(tos_result.get("ok") and nsfw_result.get("ok"))
 
+        if ready is not None and not ready.is_set():
+            try:
+                await asyncio.wait_for(ready.wait(), timeout=ready_timeout)
+            except TimeoutError:
+                pass
+
         sem = asyncio.Semaphore(concurrency)
 
         async def _run_one(token: str) -> bool:
             async with sem:
-                return await asyncio.to_thread(_apply_settings, token)
-
-        tasks = [_run_one(token) for token in tokens]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-
-        ok = 0
-        failed = 0
-        for res in results:
-            if isinstance(res, Exception):
-                failed += 1
-            elif res:
-                ok += 1
-            else:
-                failed += 1
+                try:
+                    return await asyncio.to_thread(_apply_settings, token)
+                except Exception:
+                    return False
+
+        async with asyncio.TaskGroup() as tg:
+            tasks = [tg.create_task(_run_one(token)) for token in tokens]
+
+        ok = sum(1 for task in tasks if task.result())
+        failed = len(tasks) - ok
 
         done_marker.write_text(str(int(time.time())), encoding="utf-8")
         logger.info(
@@ -59,13 +59,23 @@ def _make_json_sink(output):
     return sink
 
 
+# 当前日志文件: [日期, 文件对象]；仅在 enqueue 的写线程中访问
+_log_file_state = [None, None]
+
+
 def _file_json_sink(message):
-    """写入日志文件"""
+    """写入日志文件（按日期切换文件，同一天内复用句柄）"""
     record = message.record
     json_str = _format_json(record)
-    log_file = LOG_DIR / f"app_{record['time'].strftime('%Y-%m-%d')}.log"
-    with open(log_file, "a", encoding="utf-8") as f:
-        f.write(json_str + "\n")
+    day = record["time"].strftime("%Y-%m-%d")
+    f = _log_file_state[1]
+    if _log_file_state[0] != day or f is None:
+        if f is not None:
+            f.close()
+        f = open(LOG_DIR / f"app_{day}.log", "a", encoding="utf-8")
+        _log_file_state[:] = [day, f]
+    f.write(json_str + "\n")
+    f.flush()
 
 
 def setup_logging(
@@ -73,8 +83,17 @@ def setup_logging(
     json_console: bool = True,
     file_logging: bool = True,
 ):
-    """设置日志配置"""
+    """
+    设置日志配置
+
+    所有 sink 均使用 enqueue=True：事件循环线程只负责入队，
+    格式化后的写入由 loguru 的后台线程完成。
+    """
     logger.remove()
+    # remove() 会等待写线程退出；关闭旧 sink 缓存的文件句柄，新 sink 重新打开
+    if _log_file_state[1] is not None:
+        _log_file_state[1].close()
+    _log_file_state[:] = [None, None]
     
     # 控制台输出
     if json_console:
@@ -83,6 +102,7 @@ def setup_logging(
             level=level,
             format="{message}",
             colorize=False,
+            enqueue=True,
         )
     else:
         logger.add(
@@ -90,6 +110,7 @@ def setup_logging(
             level=level,
             format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{file.name}:{line}</cyan> - <level>{message}</level>",
             colorize=True,
+            enqueue=True,
         )
     
     # 文件输出
@@ -7,63 +7,82 @@ Response Middleware
 
 import time
 import uuid
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
-from starlette.types import ASGIApp
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app.core.logger import logger
 
-class ResponseLoggerMiddleware(BaseHTTPMiddleware):
+class ResponseLoggerMiddleware:
     """
     请求日志/响应追踪中间件
     Request Logging and Response Tracking Middleware
+
+    纯 ASGI 实现：只包装 send 以获取状态码，响应体（包括 SSE 流）原样透传，
+    不经过 BaseHTTPMiddleware 的流转发。
     """
-    
-    async def dispatch(self, request: Request, call_next):
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+        method = request.method
+        path = request.url.path
+
         # 生成请求 ID
         trace_id = str(uuid.uuid4())
         request.state.trace_id = trace_id
-        
+
         start_time = time.time()
-        
+
         # 记录请求信息
         logger.info(
-            f"Request: {request.method} {request.url.path}",
+            f"Request: {method} {path}",
             extra={
                 "traceID": trace_id,
-                "method": request.method,
-                "path": request.url.path
+                "method": method,
+                "path": path
             }
         )
-        
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                # 计算耗时（到响应头发出为止，流式响应不等待响应体结束）
+                duration = (time.time() - start_time) * 1000
+                status_code = message["status"]
+
+                # 记录响应信息
+                logger.info(
+                    f"Response: {method} {path} - {status_code} ({duration:.2f}ms)",
+                    extra={
+                        "traceID": trace_id,
+                        "method": method,
+                        "path": path,
+                        "status": status_code,
+                        "duration_ms": round(duration, 2)
+                    }
+                )
+
+                # 标记首个请求已完成（lifespan 中的后台迁移等待该事件）
+                ready = getattr(scope["app"].state, "ready", None) if "app" in scope else None
+                if ready is not None and not ready.is_set():
+                    ready.set()
+            await send(message)
+
         try:
-            response = await call_next(request)
-            
-            # 计算耗时
-            duration = (time.time() - start_time) * 1000
-            
-            # 记录响应信息
-            logger.info(
-                f"Response: {request.method} {request.url.path} - {response.status_code} ({duration:.2f}ms)",
-                extra={
-                    "traceID": trace_id,
-                    "method": request.method,
-                    "path": request.url.path,
-                    "status": response.status_code,
-                    "duration_ms": round(duration, 2)
-                }
-            )
-            
-            return response
-            
+            await self.app(scope, receive, send_wrapper)
         except Exception as e:
             duration = (time.time() - start_time) * 1000
             logger.error(
-                f"Response Error: {request.method} {request.url.path} - {str(e)} ({duration:.2f}ms)",
+                f"Response Error: {method} {path} - {str(e)} ({duration:.2f}ms)",
                 extra={
                     "traceID": trace_id,
-                    "method": request.method,
-                    "path": request.url.path,
+                    "method": method,
+                    "path": path,
                     "duration_ms": round(duration, 2),
                     "error": str(e)
                 }
@@ -14,9 +14,10 @@ import os
 import asyncio
 import os
 import hashlib
+import shutil
 import time
 import tomllib
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from pathlib import Path
 from enum import Enum
 try:
@@ -32,6 +33,11 @@ from app.core.logger import logger
 # 配置文件路径
 CONFIG_FILE = Path(__file__).parent.parent.parent / "data" / "config.toml"
 TOKEN_FILE = Path(__file__).parent.parent.parent / "data" / "token.json"
+TOKEN_DELTA_FILE = TOKEN_FILE.with_suffix(".jsonl")
+# 压缩期间轮转出的增量日志，快照替换成功后删除
+TOKEN_DELTA_OLD_FILE = TOKEN_FILE.with_suffix(".jsonl.old")
+# 快照临时文件；与 token.jsonl.old 同时存在时表示压缩在替换快照前中断
+TOKEN_TEMP_FILE = TOKEN_FILE.with_suffix(".tmp")
 LOCK_DIR = Path(__file__).parent.parent.parent / "data" / ".locks"
 
 # JSON 序列化优化助手函数
@@ -48,6 +54,9 @@ class StorageError(Exception):
 class BaseStorage(abc.ABC):
     """存储基类"""
 
+    # 是否支持 save_tokens_raw (直接写入已序列化的 Token JSON)
+    supports_raw_tokens = False
+
     @abc.abstractmethod
     async def load_config(self) -> Dict[str, Any]:
         """加载配置"""
@@ -68,6 +77,22 @@ class BaseStorage(abc.ABC):
         """保存所有 Token"""
         pass
 
+    async def save_tokens_raw(self, blob: bytes):
+        """保存已序列化的全部 Token (仅 supports_raw_tokens 为 True 的后端实现)"""
+        raise NotImplementedError
+
+    async def save_token_deltas(self, deltas: List[Tuple[str, Dict[str, Any], bytes]]) -> bool:
+        """
+        增量保存变更的 Token
+        
+        Args:
+            deltas: (pool_name, token_data, token_data 的 JSON 序列化) 列表
+            
+        Returns:
+            False 表示后端不支持增量写入，调用方需回退到 save_tokens 全量保存
+        """
+        return False
+
     @abc.abstractmethod
     async def close(self):
         """关闭资源"""
@@ -97,10 +122,22 @@ class LocalStorage(BaseStorage):
     - 使用 aiofiles 进行异步 I/O
     - 使用 asyncio.Lock 进行进程内并发控制
     - 如果需要多进程安全，需要系统级文件锁 (fcntl)
+    - Token 增量变更追加到 token.jsonl，日志超过快照 4 倍时压缩回 token.json
+    - 压缩时 token.jsonl 先轮转为 token.jsonl.old，新快照落盘后才删除
+    - Token 文件读写与压缩均在线程中执行，不阻塞事件循环
     """
+
+    supports_raw_tokens = True
+
+    # 增量日志超过快照大小的该倍数时触发压缩
+    DELTA_COMPACT_RATIO = 4
+    # 快照过小时的压缩下限 (字节)，避免频繁压缩
+    DELTA_COMPACT_MIN_BYTES = 64 * 1024
     
     def __init__(self):
         self._lock = asyncio.Lock()
+        # 串行化快照写入、增量追加与压缩
+        self._token_lock = asyncio.Lock()
         
     @asynccontextmanager
     async def acquire_lock(self, name: str, timeout: int = 10):
@@ -190,32 +227,144 @@ class LocalStorage(BaseStorage):
             raise StorageError(f"保存配置失败: {e}")
 
     async def load_tokens(self) -> Dict[str, Any]:
-        if not TOKEN_FILE.exists():
-            return {}
-        try:
-            async with aiofiles.open(TOKEN_FILE, "rb") as f:
-                content = await f.read()
-                return json_loads(content)
-        except Exception as e:
-            logger.error(f"LocalStorage: 加载 Token 失败: {e}")
-            return {}
+        return await asyncio.to_thread(self._read_tokens)
+
+    def _read_tokens(self, strict: bool = False) -> Dict[str, Any]:
+        """读取快照并回放增量日志 (同步，在线程中执行)；strict 时快照损坏直接抛出"""
+        data: Dict[str, Any] = {}
+        if TOKEN_FILE.exists():
+            try:
+                data = json_loads(TOKEN_FILE.read_bytes())
+            except Exception as e:
+                if strict:
+                    raise
+                logger.error(f"LocalStorage: 加载 Token 失败: {e}")
+                return {}
+        # 上次压缩中断时，轮转出的旧日志先于当前日志回放
+        delta_files = [TOKEN_DELTA_FILE]
+        if self._rotated_deltas_pending():
+            delta_files.insert(0, TOKEN_DELTA_OLD_FILE)
+        for path in delta_files:
+            if not path.exists():
+                continue
+            try:
+                self._apply_deltas(data, path.read_bytes())
+            except Exception as e:
+                if strict:
+                    raise
+                logger.error(f"LocalStorage: 回放 Token 增量日志失败 ({path.name}): {e}")
+        return data
+
+    @staticmethod
+    def _rotated_deltas_pending() -> bool:
+        """
+        token.jsonl.old 是否尚未并入快照。
+        .old 只在临时快照写好之后产生，并在临时快照替换 token.json 之后删除：
+        两者同时存在说明压缩在替换快照前中断；只剩 .old 说明快照已替换，.old 已过期。
+        """
+        return TOKEN_DELTA_OLD_FILE.exists() and TOKEN_TEMP_FILE.exists()
+
+    def _rotate_deltas(self, pending: bool):
+        """将当前增量日志轮转为 token.jsonl.old"""
+        if not TOKEN_DELTA_FILE.exists():
+            return
+        if pending:
+            # 上次压缩未完成：新增量接在旧日志之后，保持回放顺序
+            with open(TOKEN_DELTA_OLD_FILE, "ab") as dst, open(TOKEN_DELTA_FILE, "rb") as src:
+                shutil.copyfileobj(src, dst)
+            TOKEN_DELTA_FILE.unlink()
+        else:
+            os.replace(TOKEN_DELTA_FILE, TOKEN_DELTA_OLD_FILE)
+
+    def _write_snapshot(self, blob: bytes):
+        """写入新快照并轮转增量日志 (同步，在线程中执行)"""
+        TOKEN_FILE.parent.mkdir(parents=True, exist_ok=True)
+        pending = self._rotated_deltas_pending()
+        if not pending:
+            # 已过期的旧日志必须在写临时快照前删除，否则会被误判为未并入
+            TOKEN_DELTA_OLD_FILE.unlink(missing_ok=True)
+
+        # 原子写操作: 写入临时文件 -> 重命名
+        TOKEN_TEMP_FILE.write_bytes(blob)
+
+        # 快照已包含全部数据：先轮转增量日志，避免旧增量覆盖新快照；
+        # 新快照替换成功后才删除轮转出的日志，中途崩溃时仍可回放
+        self._rotate_deltas(pending)
+        # 使用 os.replace 保证原子性
+        os.replace(TOKEN_TEMP_FILE, TOKEN_FILE)
+        TOKEN_DELTA_OLD_FILE.unlink(missing_ok=True)
+
+    def _compact_deltas(self):
+        """将增量日志合并回快照 (同步，在线程中执行)"""
+        self._write_snapshot(orjson.dumps(self._read_tokens(strict=True)))
+
+    @staticmethod
+    def _apply_deltas(data: Dict[str, Any], content: bytes):
+        """按顺序将增量日志回放到快照上 (同一 Token 以最后一条为准)"""
+        index: Dict[str, Dict[str, int]] = {}
+        for line in content.splitlines():
+            if not line.strip():
+                continue
+            try:
+                entry = json_loads(line)
+                pool_name = entry["pool"]
+                token_str = entry["token"]
+                token_data = entry["data"]
+            except Exception:
+                # 进程中断可能留下半行，跳过即可
+                continue
+            tokens = data.setdefault(pool_name, [])
+            pos = index.get(pool_name)
+            if pos is None:
+                pos = index[pool_name] = {
+                    t.get("token"): i for i, t in enumerate(tokens) if isinstance(t, dict)
+                }
+            i = pos.get(token_str)
+            if i is None:
+                pos[token_str] = len(tokens)
+                tokens.append(token_data)
+            else:
+                tokens[i] = token_data
 
     async def save_tokens(self, data: Dict[str, Any]):
+        # 与 TokenManager 直接写入的快照保持同一格式 (紧凑 JSON)
+        await self.save_tokens_raw(orjson.dumps(data))
+
+    async def save_tokens_raw(self, blob: bytes):
         try:
-            TOKEN_FILE.parent.mkdir(parents=True, exist_ok=True)
-            temp_path = TOKEN_FILE.with_suffix('.tmp')
-            
-            # 原子写操作: 写入临时文件 -> 重命名
-            async with aiofiles.open(temp_path, "wb") as f:
-                await f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
-            
-            # 使用 os.replace 保证原子性
-            os.replace(temp_path, TOKEN_FILE)
-            
+            async with self._token_lock:
+                await asyncio.to_thread(self._write_snapshot, blob)
         except Exception as e:
             logger.error(f"LocalStorage: 保存 Token 失败: {e}")
             raise StorageError(f"保存 Token 失败: {e}")
 
+    async def save_token_deltas(self, deltas: List[Tuple[str, Dict[str, Any], bytes]]) -> bool:
+        if not deltas:
+            return True
+        # 直接嵌入已序列化的 Token JSON，整批一次写入
+        payload = b"".join(
+            orjson.dumps({"pool": pool_name, "token": t.get("token"), "data": orjson.Fragment(blob)}) + b"\n"
+            for pool_name, t, blob in deltas
+        )
+        # 追加与压缩共用一把锁：压缩轮转日志期间不会有新的增量写入
+        async with self._token_lock:
+            try:
+                TOKEN_DELTA_FILE.parent.mkdir(parents=True, exist_ok=True)
+                async with aiofiles.open(TOKEN_DELTA_FILE, "ab") as f:
+                    await f.write(payload)
+            except Exception as e:
+                logger.error(f"LocalStorage: 追加 Token 增量失败: {e}")
+                raise StorageError(f"保存 Token 失败: {e}")
+
+            try:
+                snapshot_size = TOKEN_FILE.stat().st_size if TOKEN_FILE.exists() else 0
+                threshold = max(snapshot_size, self.DELTA_COMPACT_MIN_BYTES) * self.DELTA_COMPACT_RATIO
+                if TOKEN_DELTA_FILE.stat().st_size > threshold:
+                    await asyncio.to_thread(self._compact_deltas)
+            except Exception as e:
+                logger.warning(f"LocalStorage: 压缩 Token 增量日志失败: {e}")
+        return True
+
     async def close(self):
         pass
 
@@ -434,16 +583,7 @@ class RedisStorage(BaseStorage):
                         token_str = t.get("token")
                         if not token_str:
                             continue
-                        t_flat = t.copy()
-                        if "tags" in t_flat:
-                            t_flat["tags"] = json_dumps(t_flat["tags"])
-                        status = t_flat.get("status")
-                        if isinstance(status, str) and status.startswith("TokenStatus."):
-                            t_flat["status"] = status.split(".", 1)[1].lower()
-                        elif isinstance(status, Enum):
-                            t_flat["status"] = status.value
-                        t_flat = {k: str(v) for k, v in t_flat.items() if v is not None}
-                        pipe.hset(f"{self.prefix_token_hash}{token_str}", mapping=t_flat)
+                        pipe.hset(f"{self.prefix_token_hash}{token_str}", mapping=self._flatten_token(t))
 
                 await pipe.execute()
                 
@@ -451,6 +591,45 @@ class RedisStorage(BaseStorage):
             logger.error(f"RedisStorage: 保存 Token 失败: {e}")
             raise
 
+    async def save_token_deltas(self, deltas: List[Tuple[str, Dict[str, Any], bytes]]) -> bool:
+        """
+        仅写入变更的 Token (单次 MULTI/EXEC 往返)
+
+        其他进程可能已通过全量 save_tokens 删除或重写该 Token，因此每个 Token 都整体覆盖
+        Hash 并补齐池索引，而不是按本进程缓存的旧值只写变化字段。
+        """
+        if not deltas:
+            return True
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                for pool_name, t, _ in deltas:
+                    token_str = t.get("token")
+                    if not token_str:
+                        continue
+                    key = f"{self.prefix_token_hash}{token_str}"
+                    pipe.sadd(self.key_pools, pool_name)
+                    pipe.sadd(f"{self.prefix_pool_set}{pool_name}", token_str)
+                    pipe.delete(key)
+                    pipe.hset(key, mapping=self._flatten_token(t))
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"RedisStorage: 增量保存 Token 失败: {e}")
+            raise
+
+    @staticmethod
+    def _flatten_token(t: Dict[str, Any]) -> Dict[str, str]:
+        """Token 字典 -> Redis Hash (全 string)"""
+        t_flat = t.copy()
+        if "tags" in t_flat:
+            t_flat["tags"] = json_dumps(t_flat["tags"])
+        status = t_flat.get("status")
+        if isinstance(status, str) and status.startswith("TokenStatus."):
+            t_flat["status"] = status.split(".", 1)[1].lower()
+        elif isinstance(status, Enum):
+            t_flat["status"] = status.value
+        return {k: str(v) for k, v in t_flat.items() if v is not None}
+
     async def close(self):
         try:
             await self.redis.close()
@@ -20,6 +20,8 @@ from app.services.register.services import (
     TurnstileService,
     UserAgreementService,
     NsfwSettingsService,
+    build_pooled_session,
+    get_user_agreement_service,
 )
 
 
@@ -34,54 +36,118 @@ CHROME_PROFILES = [
     {"impersonate": "edge101", "version": "101.0.1210.47", "brand": "edge"},
 ]
 
+_SITEKEY_RE = re.compile(r'sitekey":"(0x4[a-zA-Z0-9_-]+)"')
+_TREE_RE = re.compile(r'next-router-state-tree":"([^"]+)"')
+_ACTION_ID_RE = re.compile(rb"7f[a-fA-F0-9]{40}")
+_ACTION_ID_TAIL = 41
+_VERIFY_CODE_RE = re.compile(r">([A-Z0-9]{3}-[A-Z0-9]{3})<")
+_LOWER_DIGITS = string.ascii_lowercase + string.digits
+_SETCOOKIE_MARKER = b"set-cookie?q="
+_URL_STOP_BYTES = frozenset(b'" \t\r\n\f\v')
 
-def _random_chrome_profile() -> Tuple[str, str]:
-    profile = random.choice(CHROME_PROFILES)
+
+def _build_user_agent(profile: Dict[str, str]) -> str:
     if profile.get("brand") == "edge":
         chrome_major = profile["version"].split(".")[0]
         chrome_version = f"{chrome_major}.0.0.0"
-        ua = (
+        return (
             "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
             "AppleWebKit/537.36 (KHTML, like Gecko) "
             f"Chrome/{chrome_version} Safari/537.36 Edg/{profile['version']}"
         )
-    else:
-        ua = (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            f"Chrome/{profile['version']} Safari/537.36"
-        )
-    return profile["impersonate"], ua
+    return (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        f"Chrome/{profile['version']} Safari/537.36"
+    )
+
+
+_PROFILE_UAS: List[Tuple[str, str]] = [
+    (profile["impersonate"], _build_user_agent(profile)) for profile in CHROME_PROFILES
+]
+
+
+def _random_chrome_profile() -> Tuple[str, str]:
+    return random.choice(_PROFILE_UAS)
+
+
+def _extract_quoted_value(text: str, marker: str) -> Optional[str]:
+    """Return the value between ``marker`` and the next double quote, if present."""
+    idx = text.find(marker)
+    if idx == -1:
+        return None
+    start = idx + len(marker)
+    end = text.find('"', start)
+    if end <= start:
+        return None
+    return text[start:end]
+
+
+def _extract_set_cookie_url(body: bytes) -> Optional[str]:
+    """Find the ``https://...set-cookie?q=...`` redirect (terminated by ``1:``) in a sign-up reply."""
+    pos = body.find(_SETCOOKIE_MARKER)
+    while pos != -1:
+        start = body.rfind(b"https://", 0, pos)
+        query_start = pos + len(_SETCOOKIE_MARKER)
+        end = body.find(b":", query_start)
+        if (
+            start != -1
+            and end - 1 > query_start
+            and body[end - 1] == ord("1")
+            and not _URL_STOP_BYTES.intersection(body[start:end])
+        ):
+            return body[start : end - 1].decode("utf-8", "replace")
+        pos = body.find(_SETCOOKIE_MARKER, query_start)
+    return None
 
 
 def _generate_random_name() -> str:
     length = random.randint(4, 6)
-    return random.choice(string.ascii_uppercase) + "".join(
-        random.choice(string.ascii_lowercase) for _ in range(length - 1)
-    )
+    return random.choice(string.ascii_uppercase) + "".join(random.choices(string.ascii_lowercase, k=length - 1))
 
 
 def _generate_random_string(length: int = 15) -> str:
-    return "".join(random.choice(string.ascii_lowercase + string.digits) for _ in range(length))
+    return "".join(random.choices(_LOWER_DIGITS, k=length))
+
+
+_GRPC_FRAME_HEADER = struct.Struct(">BI")
+
+
+def _append_string_field(buf: bytearray, field_id: int, value: str) -> None:
+    value_bytes = value.encode("utf-8")
+    buf.append((field_id << 3) | 2)
+    length = len(value_bytes)
+    while length > 0x7F:
+        buf.append((length & 0x7F) | 0x80)
+        length >>= 7
+    buf.append(length)
+    buf += value_bytes
+
+
+def _encode_grpc_frame(*fields: Tuple[int, str]) -> bytes:
+    buf = bytearray(_GRPC_FRAME_HEADER.size)
+    for field_id, value in fields:
+        _append_string_field(buf, field_id, value)
+    _GRPC_FRAME_HEADER.pack_into(buf, 0, 0, len(buf) - _GRPC_FRAME_HEADER.size)
+    return bytes(buf)
 
 
 def _encode_grpc_message(field_id: int, string_value: str) -> bytes:
-    key = (field_id << 3) | 2
-    value_bytes = string_value.encode("utf-8")
-    payload = struct.pack("B", key) + struct.pack("B", len(value_bytes)) + value_bytes
-    return b"\x00" + struct.pack(">I", len(payload)) + payload
+    return _encode_grpc_frame((field_id, string_value))
 
 
 def _encode_grpc_message_verify(email: str, code: str) -> bytes:
-    p1 = struct.pack("B", (1 << 3) | 2) + struct.pack("B", len(email)) + email.encode("utf-8")
-    p2 = struct.pack("B", (2 << 3) | 2) + struct.pack("B", len(code)) + code.encode("utf-8")
-    payload = p1 + p2
-    return b"\x00" + struct.pack(">I", len(payload)) + payload
+    return _encode_grpc_frame((1, email), (2, code))
 
 
 class RegisterRunner:
     """Threaded registration runner."""
 
+    # Discovered sign-up config shared across runs: (monotonic timestamp, config).
+    _INIT_CACHE_TTL = 3600.0
+    _init_cache: Optional[Tuple[float, Dict[str, Optional[str]]]] = None
+    _init_cache_lock = threading.Lock()
+
     def __init__(
         self,
         target_count: int = 100,
@@ -96,8 +162,10 @@ class RegisterRunner:
         self.on_error = on_error
         self.stop_event = stop_event or threading.Event()
 
-        self._post_lock = threading.Lock()
         self._result_lock = threading.Lock()
+        self._local = threading.local()
+        self._solver_session = build_pooled_session(self.thread_count)
+        self._sign_up_headers: Dict[str, str] = {}
 
         self._success_count = 0
         self._start_time = 0.0
@@ -159,20 +227,53 @@ class RegisterRunner:
             except Exception:
                 pass
 
+    def _get_services(
+        self,
+    ) -> Tuple[EmailService, TurnstileService, UserAgreementService, NsfwSettingsService]:
+        """Return this thread's service instances, creating them on first use."""
+        services = getattr(self._local, "services", None)
+        if services is None:
+            services = (
+                EmailService(),
+                TurnstileService(session=self._solver_session),
+                get_user_agreement_service(),
+                NsfwSettingsService(),
+            )
+            self._local.services = services
+        return services
+
+    @classmethod
+    def _invalidate_init_cache(cls) -> None:
+        with cls._init_cache_lock:
+            cls._init_cache = None
+
     def _init_config(self) -> None:
+        with self._init_cache_lock:
+            cached = RegisterRunner._init_cache
+        if cached and time.monotonic() - cached[0] < self._INIT_CACHE_TTL:
+            self._config.update(cached[1])
+            logger.info("Register: using cached action config: {}", self._config["action_id"])
+            return
+
         logger.info("Register: initializing action config...")
         start_url = f"{SITE_URL}/sign-up"
 
         with curl_requests.Session(impersonate=DEFAULT_IMPERSONATE) as session:
             html = session.get(start_url, timeout=15).text
 
-            key_match = re.search(r'sitekey":"(0x4[a-zA-Z0-9_-]+)"', html)
-            if key_match:
-                self._config["site_key"] = key_match.group(1)
+            site_key = _extract_quoted_value(html, 'sitekey":"')
+            if not site_key or not site_key.startswith("0x4"):
+                key_match = _SITEKEY_RE.search(html)
+                site_key = key_match.group(1) if key_match else None
+            if site_key:
+                self._config["site_key"] = site_key
 
-            tree_match = re.search(r'next-router-state-tree":"([^"]+)"', html)
-            if tree_match:
-                self._config["state_tree"] = tree_match.group(1)
+            state_tree = _extract_quoted_value(html, 'next-router-state-tree":"')
+            if not state_tree:
+                tree_match = _TREE_RE.search(html)
+                state_tree = tree_match.group(1) if tree_match else None
+            if state_tree:
+                self._config["state_tree"] = state_tree
 
             soup = BeautifulSoup(html, "html.parser")
             js_urls = [
@@ -181,16 +282,36 @@ class RegisterRunner:
                 if "_next/static" in script["src"]
             ]
             for js_url in js_urls:
-                js_content = session.get(js_url, timeout=15).text
-                match = re.search(r"7f[a-fA-F0-9]{40}", js_content)
-                if match:
-                    self._config["action_id"] = match.group(0)
-                    logger.info("Register: Action ID found: {}", self._config["action_id"])
+                action_id = self._scan_action_id(session, js_url)
+                if action_id:
+                    self._config["action_id"] = action_id
+                    logger.info("Register: Action ID found: {}", action_id)
                     break
 
         if not self._config.get("action_id"):
             raise RuntimeError("Register init failed: missing action_id")
 
+        with self._init_cache_lock:
+            RegisterRunner._init_cache = (time.monotonic(), dict(self._config))
+
+    @staticmethod
+    def _scan_action_id(session: curl_requests.Session, js_url: str) -> Optional[str]:
+        """Stream a JS bundle and stop reading as soon as the action id shows up."""
+        res = session.get(js_url, timeout=15, stream=True)
+        try:
+            tail = b""
+            for chunk in res.iter_content(chunk_size=65536):
+                if not chunk:
+                    continue
+                buf = tail + chunk
+                match = _ACTION_ID_RE.search(buf)
+                if match:
+                    return match.group(0).decode("ascii")
+                tail = buf[-_ACTION_ID_TAIL:]
+        finally:
+            res.close()
+        return None
+
     def _send_email_code(self, session: curl_requests.Session, email: str) -> bool:
         url = f"{SITE_URL}/auth_mgmt.AuthManagement/CreateEmailValidationCode"
         data = _encode_grpc_message(1, email)
@@ -225,177 +346,182 @@ class RegisterRunner:
             self._record_error(f"verify code error: {email} - {exc}")
             return False
 
-    def _register_single_thread(self) -> None:
-        time.sleep(random.uniform(0, 5))
+    def _register_one_account(self, stagger: bool = False) -> bool:
+        """Run a single registration attempt; return True when an account was created."""
+        if stagger:
+            if self.stop_event.wait(random.uniform(0, 5)):
+                return False
+        elif self.stop_event.is_set():
+            return False
 
         try:
-            email_service = EmailService()
-            turnstile_service = TurnstileService()
-            user_agreement_service = UserAgreementService()
-            nsfw_service = NsfwSettingsService()
-        except Exception as exc:
-            self._record_error(f"service init failed: {exc}")
-            return
-
-        final_action_id = self._config.get("action_id")
-        if not final_action_id:
-            self._record_error("missing action id")
-            return
+            email_service, turnstile_service, user_agreement_service, nsfw_service = self._get_services()
+            impersonate_fingerprint, account_user_agent = _random_chrome_profile()
 
-        while not self.stop_event.is_set():
-            try:
-                impersonate_fingerprint, account_user_agent = _random_chrome_profile()
+            with curl_requests.Session(impersonate=impersonate_fingerprint) as session:
+                try:
+                    session.get(SITE_URL, timeout=10)
+                except Exception:
+                    pass
 
-                with curl_requests.Session(impersonate=impersonate_fingerprint) as session:
-                    try:
-                        session.get(SITE_URL, timeout=10)
-                    except Exception:
-                        pass
+                password = _generate_random_string()
+
+                jwt, email = email_service.create_email()
+                if not email:
+                    self._record_error("create_email failed")
+                    self.stop_event.wait(5)
+                    return False
+
+                if not self._send_email_code(session, email):
+                    self._record_error(f"send_email_code failed: {email}")
+                    self.stop_event.wait(5)
+                    return False
+
+                verify_code = None
+                for _ in range(30):
+                    if self.stop_event.wait(1):
+                        return False
+                    content = email_service.fetch_first_email(jwt)
+                    if content:
+                        match = _VERIFY_CODE_RE.search(content)
+                        if match:
+                            verify_code = match.group(1).replace("-", "")
+                            break
 
-                    password = _generate_random_string()
+                if not verify_code:
+                    self._record_error(f"verify_code not received: {email}")
+                    self.stop_event.wait(3)
+                    return False
 
-                    jwt, email = email_service.create_email()
-                    if not email:
-                        self._record_error("create_email failed")
-                        time.sleep(5)
-                        continue
+                if not self._verify_email_code(session, email, verify_code):
+                    self._record_error(f"verify_email_code failed: {email}")
+                    self.stop_event.wait(3)
+                    return False
 
+                for _ in range(3):
                     if self.stop_event.is_set():
-                        return
+                        return False
 
-                    if not self._send_email_code(session, email):
-                        self._record_error(f"send_email_code failed: {email}")
-                        time.sleep(5)
+                    try:
+                        task_id = turnstile_service.create_task(f"{SITE_URL}/sign-up", self._config["site_key"] or "")
+                    except Exception as exc:
+                        self._record_error(f"turnstile create_task failed: {exc}")
+                        self.stop_event.wait(2)
                         continue
 
-                    verify_code = None
-                    for _ in range(30):
-                        time.sleep(1)
-                        if self.stop_event.is_set():
-                            return
-                        content = email_service.fetch_first_email(jwt)
-                        if content:
-                            match = re.search(r">([A-Z0-9]{3}-[A-Z0-9]{3})<", content)
-                            if match:
-                                verify_code = match.group(1).replace("-", "")
-                                break
-
-                    if not verify_code:
-                        self._record_error(f"verify_code not received: {email}")
-                        time.sleep(3)
-                        continue
+                    token = turnstile_service.get_response(task_id, stop_event=self.stop_event)
 
-                    if not self._verify_email_code(session, email, verify_code):
-                        self._record_error(f"verify_email_code failed: {email}")
-                        time.sleep(3)
+                    if not token:
+                        self._record_error(f"turnstile failed: {turnstile_service.last_error or 'no token'}")
+                        self.stop_event.wait(2)
                         continue
 
-                    for _ in range(3):
-                        if self.stop_event.is_set():
-                            return
-
-                        try:
-                            task_id = turnstile_service.create_task(f"{SITE_URL}/sign-up", self._config["site_key"] or "")
-                        except Exception as exc:
-                            self._record_error(f"turnstile create_task failed: {exc}")
-                            time.sleep(2)
-                            continue
-
-                        token = turnstile_service.get_response(task_id, stop_event=self.stop_event)
-
-                        if not token:
-                            self._record_error(f"turnstile failed: {turnstile_service.last_error or 'no token'}")
-                            time.sleep(2)
-                            continue
-
-                        headers = {
-                            "user-agent": account_user_agent,
-                            "accept": "text/x-component",
-                            "content-type": "text/plain;charset=UTF-8",
-                            "origin": SITE_URL,
-                            "referer": f"{SITE_URL}/sign-up",
-                            "cookie": f"__cf_bm={session.cookies.get('__cf_bm','')}",
-                            "next-router-state-tree": self._config["state_tree"] or "",
-                            "next-action": final_action_id,
+                    headers = {**self._sign_up_headers, "user-agent": account_user_agent}
+                    payload = [
+                        {
+                            "emailValidationCode": verify_code,
+                            "createUserAndSessionRequest": {
+                                "email": email,
+                                "givenName": _generate_random_name(),
+                                "familyName": _generate_random_name(),
+                                "clearTextPassword": password,
+                                "tosAcceptedVersion": "$undefined",
+                            },
+                            "turnstileToken": token,
+                            "promptOnDuplicateEmail": True,
                         }
-                        payload = [
-                            {
-                                "emailValidationCode": verify_code,
-                                "createUserAndSessionRequest": {
-                                    "email": email,
-                                    "givenName": _generate_random_name(),
-                                    "familyName": _generate_random_name(),
-                                    "clearTextPassword": password,
-                                    "tosAcceptedVersion": "$undefined",
-                                },
-                                "turnstileToken": token,
-                                "promptOnDuplicateEmail": True,
-                            }
-                        ]
-
-                        with self._post_lock:
-                            res = session.post(
-                                f"{SITE_URL}/sign-up",
-                                json=payload,
-                                headers=headers,
-                                timeout=20,
-                            )
-
-                        if res.status_code != 200:
-                            self._record_error(f"sign_up http {res.status_code}")
-                            time.sleep(3)
-                            continue
-
-                        match = re.search(r'(https://[^" \s]+set-cookie\?q=[^:" \s]+)1:', res.text)
-                        if not match:
-                            self._record_error("sign_up missing set-cookie redirect")
-                            break
+                    ]
+
+                    res = session.post(
+                        f"{SITE_URL}/sign-up",
+                        json=payload,
+                        headers=headers,
+                        timeout=20,
+                    )
+
+                    if res.status_code != 200:
+                        self._invalidate_init_cache()
+                        self._record_error(f"sign_up http {res.status_code}")
+                        self.stop_event.wait(3)
+                        continue
 
-                        verify_url = match.group(1)
-                        session.get(verify_url, allow_redirects=True, timeout=15)
+                    verify_url = _extract_set_cookie_url(res.content)
+                    if not verify_url:
+                        self._invalidate_init_cache()
+                        self._record_error("sign_up missing set-cookie redirect")
+                        break
 
-                        sso = session.cookies.get("sso")
-                        sso_rw = session.cookies.get("sso-rw")
-                        if not sso:
-                            self._record_error("sign_up missing sso cookie")
-                            break
+                    session.get(verify_url, allow_redirects=True, timeout=15)
 
-                        tos_result = user_agreement_service.accept_tos_version(
-                            sso=sso,
-                            sso_rw=sso_rw or "",
-                            impersonate=impersonate_fingerprint,
-                            user_agent=account_user_agent,
-                        )
-                        if not tos_result.get("ok") or not tos_result.get("hex_reply"):
-                            self._record_error(f"accept_tos failed: {tos_result.get('error') or 'unknown'}")
-                            break
+                    sso = session.cookies.get("sso")
+                    sso_rw = session.cookies.get("sso-rw")
+                    if not sso:
+                        self._record_error("sign_up missing sso cookie")
+                        break
 
-                        nsfw_result = nsfw_service.enable_nsfw(
-                            sso=sso,
-                            sso_rw=sso_rw or "",
-                            impersonate=impersonate_fingerprint,
-                            user_agent=account_user_agent,
-                        )
-                        if not nsfw_result.get("ok") or not nsfw_result.get("hex_reply"):
-                            self._record_error(f"enable_nsfw failed: {nsfw_result.get('error') or 'unknown'}")
-                            break
+                    tos_result = user_agreement_service.accept_tos_version(
+                        sso=sso,
+                        sso_rw=sso_rw or "",
+                        impersonate=impersonate_fingerprint,
+                        user_agent=account_user_agent,
+                    )
+                    if not tos_result.get("ok") or tos_result.get("empty_reply"):
+                        self._record_error(f"accept_tos failed: {tos_result.get('error') or 'empty gRPC reply'}")
+                        break
 
-                        self._record_success(email, password, sso)
+                    nsfw_result = nsfw_service.enable_nsfw(
+                        sso=sso,
+                        sso_rw=sso_rw or "",
+                        impersonate=impersonate_fingerprint,
+                        user_agent=account_user_agent,
+                    )
+                    if not nsfw_result.get("ok") or not nsfw_result.get("hex_reply"):
+                        self._record_error(f"enable_nsfw failed: {nsfw_result.get('error') or 'unknown'}")
                         break
 
-            except Exception as exc:
-                self._record_error(f"thread error: {str(exc)[:80]}")
-                time.sleep(3)
+                    self._record_success(email, password, sso)
+                    return True
+
+        except Exception as exc:
+            self._record_error(f"thread error: {str(exc)[:80]}")
+            self.stop_event.wait(3)
+        return False
 
     def run(self) -> List[str]:
         """Run the registration process and return collected tokens."""
         self._init_config()
+        # Cookies (including __cf_bm) come from each attempt's session jar.
+        self._sign_up_headers = {
+            "accept": "text/x-component",
+            "content-type": "text/plain;charset=UTF-8",
+            "origin": SITE_URL,
+            "referer": f"{SITE_URL}/sign-up",
+            "next-router-state-tree": self._config["state_tree"] or "",
+            "next-action": self._config["action_id"] or "",
+        }
         self._start_time = time.time()
 
         logger.info("Register: starting {} threads, target {}", self.thread_count, self.target_count)
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.thread_count) as executor:
-            futures = [executor.submit(self._register_single_thread) for _ in range(self.thread_count)]
-            concurrent.futures.wait(futures)
+        try:
+            try:
+                self._get_services()
+            except Exception as exc:
+                self._record_error(f"service init failed: {exc}")
+                return []
+
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.thread_count) as executor:
+                pending = {
+                    executor.submit(self._register_one_account, True) for _ in range(self.thread_count)
+                }
+                while pending:
+                    done, pending = concurrent.futures.wait(
+                        pending, return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                    for _ in done:
+                        if not self.stop_event.is_set():
+                            pending.add(executor.submit(self._register_one_account))
+        finally:
+            self._solver_session.close()
 
         return list(self._tokens)
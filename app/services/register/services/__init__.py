@@ -1,8 +1,11 @@
 """Registration helper services."""
 
 from app.services.register.services.email_service import EmailService
-from app.services.register.services.turnstile_service import TurnstileService
-from app.services.register.services.user_agreement_service import UserAgreementService
+from app.services.register.services.turnstile_service import TurnstileService, build_pooled_session
+from app.services.register.services.user_agreement_service import (
+    UserAgreementService,
+    get_user_agreement_service,
+)
 from app.services.register.services.nsfw_service import NsfwSettingsService
 
 __all__ = [
@@ -10,4 +13,6 @@ __all__ = [
     "TurnstileService",
     "UserAgreementService",
     "NsfwSettingsService",
+    "build_pooled_session",
+    "get_user_agreement_service",
 ]
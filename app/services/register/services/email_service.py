@@ -6,6 +6,7 @@ import random
 import string
 from typing import Tuple, Optional
 
+import orjson
 import requests
 
 from app.core.config import get_config
@@ -61,7 +62,7 @@ class EmailService:
                 timeout=10,
             )
             if res.status_code == 200:
-                data = res.json()
+                data = orjson.loads(res.content)
                 return data.get("jwt"), data.get("address")
             print(f"[-] Email create failed: {res.status_code} - {res.text}")
         except Exception as exc:  # pragma: no cover - network/remote errors
@@ -81,7 +82,7 @@ class EmailService:
                 timeout=10,
             )
             if res.status_code == 200:
-                data = res.json()
+                data = orjson.loads(res.content)
                 if data.get("results"):
                     return data["results"][0].get("raw")
             return None
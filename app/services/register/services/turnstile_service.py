@@ -7,11 +7,34 @@ from typing import Optional
 
 from app.core.logger import logger
 
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 
 from app.core.config import get_config
 
 
+def _cancellable_sleep(delay: float, stop_event: object | None) -> bool:
+    """Sleep for ``delay`` seconds; return True if ``stop_event`` was set."""
+    if delay <= 0:
+        return False
+    wait = getattr(stop_event, "wait", None)
+    if wait is not None:
+        return bool(wait(delay))
+    time.sleep(delay)
+    return False
+
+
+def build_pooled_session(pool_size: int) -> requests.Session:
+    """Create a ``requests.Session`` whose connection pool fits ``pool_size`` workers."""
+    pool_size = max(1, int(pool_size))
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size * 4)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
 class TurnstileService:
     """Turnstile solver wrapper (local solver or YesCaptcha)."""
 
@@ -19,6 +42,7 @@ class TurnstileService:
         self,
         solver_url: Optional[str] = None,
         yescaptcha_key: Optional[str] = None,
+        session: Optional[requests.Session] = None,
     ) -> None:
         self.yescaptcha_key = (
             (yescaptcha_key or get_config("register.yescaptcha_key", "") or os.getenv("YESCAPTCHA_KEY", "")).strip()
@@ -31,6 +55,8 @@ class TurnstileService:
         ).strip()
         self.yescaptcha_api = "https://api.yescaptcha.com"
         self.last_error: Optional[str] = None
+        # The session may be shared between instances; last_error stays per-instance.
+        self._session = session or requests.Session()
 
     def create_task(self, siteurl: str, sitekey: str) -> str:
         """Create a Turnstile task and return task ID."""
@@ -45,22 +71,22 @@ class TurnstileService:
                     "websiteKey": sitekey,
                 },
             }
-            response = requests.post(url, json=payload, timeout=20)
+            response = self._session.post(url, json=payload, timeout=20)
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
             if data.get("errorId") != 0:
                 desc = data.get("errorDescription") or "unknown"
                 self.last_error = f"YesCaptcha createTask failed: {desc}"
                 raise RuntimeError(self.last_error)
             return data["taskId"]
 
-        response = requests.get(
+        response = self._session.get(
             f"{self.solver_url}/turnstile",
             params={"url": siteurl, "sitekey": sitekey},
             timeout=20,
         )
         response.raise_for_status()
-        data = response.json()
+        data = orjson.loads(response.content)
         task_id = data.get("taskId")
         if not task_id:
             self.last_error = data.get("errorDescription") or data.get("errorCode") or "missing taskId"
@@ -72,18 +98,23 @@ class TurnstileService:
         task_id: str,
         max_retries: int = 30,
         initial_delay: int = 5,
-        retry_delay: int = 2,
+        retry_delay: float = 3.0,
         stop_event: object | None = None,
+        min_delay: float = 1.0,
+        max_total: float = 60.0,
     ) -> Optional[str]:
-        """Fetch a Turnstile solution token."""
+        """Fetch a Turnstile solution token.
+
+        Polls with exponential backoff from ``min_delay`` up to ``retry_delay``
+        seconds, giving up after ``max_retries`` polls or ``max_total`` seconds.
+        """
         self.last_error = None
         # Make shutdown/cancel responsive.
-        if initial_delay > 0:
-            for _ in range(int(initial_delay * 10)):
-                if stop_event is not None and getattr(stop_event, "is_set", lambda: False)():
-                    return None
-                time.sleep(0.1)
+        if _cancellable_sleep(initial_delay, stop_event):
+            return None
 
+        deadline = time.monotonic() + max_total
+        delay = min(min_delay, retry_delay)
         for _ in range(max_retries):
             if stop_event is not None and getattr(stop_event, "is_set", lambda: False)():
                 return None
@@ -91,9 +122,9 @@ class TurnstileService:
                 if self.yescaptcha_key:
                     url = f"{self.yescaptcha_api}/getTaskResult"
                     payload = {"clientKey": self.yescaptcha_key, "taskId": task_id}
-                    response = requests.post(url, json=payload, timeout=20)
+                    response = self._session.post(url, json=payload, timeout=20)
                     response.raise_for_status()
-                    data = response.json()
+                    data = orjson.loads(response.content)
 
                     if data.get("errorId") != 0:
                         self.last_error = str(data.get("errorDescription") or "unknown")
@@ -108,54 +139,41 @@ class TurnstileService:
                         self.last_error = "YesCaptcha returned empty token"
                         logger.warning(self.last_error)
                         return None
-                    if status == "processing":
-                        if retry_delay > 0:
-                            for _ in range(int(retry_delay * 10)):
-                                if stop_event is not None and getattr(stop_event, "is_set", lambda: False)():
-                                    return None
-                                time.sleep(0.1)
-                        continue
-                    self.last_error = f"YesCaptcha unexpected status: {status}"
-                    logger.warning(self.last_error)
-                    if retry_delay > 0:
-                        for _ in range(int(retry_delay * 10)):
-                            if stop_event is not None and getattr(stop_event, "is_set", lambda: False)():
-                                return None
-                            time.sleep(0.1)
-                    continue
-
-                response = requests.get(
-                    f"{self.solver_url}/result",
-                    params={"id": task_id},
-                    timeout=20,
-                )
-                response.raise_for_status()
-                data = response.json()
-
-                # Solver error -> stop early (avoid polling forever on unsolvable tasks).
-                error_id = data.get("errorId")
-                if error_id is not None and error_id != 0:
-                    self.last_error = str(data.get("errorDescription") or data.get("errorCode") or "solver error")
-                    return None
-
-                token = data.get("solution", {}).get("token")
-                if token:
-                    if token != "CAPTCHA_FAIL":
-                        return token
-                    self.last_error = "CAPTCHA_FAIL"
-                    return None
-                if retry_delay > 0:
-                    for _ in range(int(retry_delay * 10)):
-                        if stop_event is not None and getattr(stop_event, "is_set", lambda: False)():
-                            return None
-                        time.sleep(0.1)
+                    if status != "processing":
+                        self.last_error = f"YesCaptcha unexpected status: {status}"
+                        logger.warning(self.last_error)
+                else:
+                    response = self._session.get(
+                        f"{self.solver_url}/result",
+                        params={"id": task_id},
+                        timeout=20,
+                    )
+                    response.raise_for_status()
+                    data = orjson.loads(response.content)
+
+                    # Solver error -> stop early (avoid polling forever on unsolvable tasks).
+                    error_id = data.get("errorId")
+                    if error_id is not None and error_id != 0:
+                        self.last_error = str(data.get("errorDescription") or data.get("errorCode") or "solver error")
+                        return None
+
+                    token = data.get("solution", {}).get("token")
+                    if token:
+                        if token != "CAPTCHA_FAIL":
+                            return token
+                        self.last_error = "CAPTCHA_FAIL"
+                        return None
             except Exception as exc:  # pragma: no cover - network/remote errors
                 self.last_error = str(exc)
                 logger.debug("Turnstile response error: {}", exc)
-                if retry_delay > 0:
-                    for _ in range(int(retry_delay * 10)):
-                        if stop_event is not None and getattr(stop_event, "is_set", lambda: False)():
-                            return None
-                        time.sleep(0.1)
 
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if _cancellable_sleep(min(delay, remaining), stop_event):
+                return None
+            delay = min(delay * 1.3, retry_delay)
+
+        if not self.last_error:
+            self.last_error = "timeout waiting for token"
         return None
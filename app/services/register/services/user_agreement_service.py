@@ -1,8 +1,14 @@
 from __future__ import annotations
 
-from typing import Optional, Dict, Any
+import asyncio
+import threading
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional, Dict, Any, List, Tuple
 
-from curl_cffi import requests
+if TYPE_CHECKING:
+    from curl_cffi import requests
+
+# curl_cffi 在首次调用时才导入，避免未使用注册功能时加载 libcurl-impersonate。
 
 DEFAULT_USER_AGENT = (
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
@@ -10,13 +16,119 @@ DEFAULT_USER_AGENT = (
     "Chrome/120.0.0.0 Safari/537.36"
 )
 
+_TOS_URL = "https://accounts.x.ai/auth_mgmt.AuthManagement/SetTosAcceptedVersion"
+
+_TOS_PAYLOAD = (
+    b"\x00\x00\x00\x00"  # 头部
+    b"\x02"  # 长度
+    b"\x10\x01"  # Field 2 = 1
+)
+
+_BASE_HEADERS = {
+    "content-type": "application/grpc-web+proto",
+    "origin": "https://accounts.x.ai",
+    "referer": "https://accounts.x.ai/accept-tos",
+    "x-grpc-web": "1",
+    "user-agent": DEFAULT_USER_AGENT,
+}
+
+_OK_GRPC = frozenset((None, "0"))
+_STATUS_ERR = {403: "403 Forbidden"}
+
+# 建连超时上限（秒），读超时沿用调用方的 timeout。
+_CONNECT_TIMEOUT = 5
+
+
+# 批量异步调用时单连接上的最大并发流数。
+_MAX_CONCURRENT_STREAMS = 8
+
+
+@lru_cache(maxsize=32)
+def _build_headers(user_agent: str, timeout_ms: int) -> Dict[str, str]:
+    """按 UA 与 deadline 缓存请求头（返回值只读，勿修改）。"""
+    return {**_BASE_HEADERS, "user-agent": user_agent, "grpc-timeout": f"{timeout_ms}m"}
+
+
+# 按 impersonate 缓存的 Session 注册表，跨所有 UserAgreementService 实例复用连接。
+# 注册表按线程隔离：cookie jar 不在并发请求之间共享。
+_SESSIONS = threading.local()
+
+
+def _is_timeout(exc: BaseException) -> bool:
+    from curl_cffi.requests.exceptions import Timeout
+
+    return isinstance(exc, Timeout)
+
+
+def _get_session(impersonate: str) -> requests.Session:
+    from curl_cffi import requests
+
+    sessions: Optional[Dict[str, requests.Session]] = getattr(_SESSIONS, "by_impersonate", None)
+    if sessions is None:
+        sessions = _SESSIONS.by_impersonate = {}
+    session = sessions.get(impersonate)
+    if session is None:
+        session = sessions[impersonate] = requests.Session(impersonate=impersonate)
+    return session
+
+
+def _error_result(error: str, grpc_status: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "ok": False,
+        "hex_reply": "",
+        "status_code": None,
+        "grpc_status": grpc_status,
+        "error": error,
+        "empty_reply": True,
+    }
+
+
+def _parse_response(response: Any) -> Dict[str, Any]:
+    grpc_status = response.headers.get("grpc-status")
+
+    status_code = response.status_code
+    if status_code != 200:
+        error = _STATUS_ERR.get(status_code) or f"HTTP {status_code}"
+    elif grpc_status not in _OK_GRPC:
+        error = f"gRPC {grpc_status}"
+    else:
+        error = None
+    ok = error is None
+
+    # 成功时不需要回包内容，仅在失败时保留 hex 便于排查。
+    hex_reply = "" if ok else response.content.hex()
+
+    return {
+        "ok": ok,
+        "hex_reply": hex_reply,
+        "status_code": status_code,
+        "grpc_status": grpc_status,
+        "error": error,
+        "empty_reply": not response.content,
+    }
+
 
 class UserAgreementService:
-    """处理账号协议同意流程（线程安全，无全局状态）。"""
+    """
+    处理账号协议同意流程。
+
+    实例本身无状态；底层 curl_cffi Session 由模块级 _SESSIONS 按线程、按 impersonate 缓存并复用，
+    进程内共享实例通过 get_user_agreement_service() 获取。
+    """
 
     def __init__(self, cf_clearance: str = ""):
         self.cf_clearance = (cf_clearance or "").strip()
 
+    def _build_cookies(self, sso: str, sso_rw: str, cf_clearance: Optional[str]) -> Dict[str, str]:
+        cookies = {
+            "sso": sso,
+            "sso-rw": sso_rw,
+        }
+        clearance = (cf_clearance if cf_clearance is not None else self.cf_clearance).strip()
+        if clearance:
+            cookies["cf_clearance"] = clearance
+        return cookies
+
     def accept_tos_version(
         self,
         sso: str,
@@ -30,86 +142,89 @@ class UserAgreementService:
         同意 TOS 版本。
         返回: {
             ok: bool,
-            hex_reply: str,
+            hex_reply: str,  # 仅失败时填充
             status_code: int | None,
             grpc_status: str | None,
-            error: str | None
+            error: str | None,
+            empty_reply: bool  # 回包为空 (是否视为失败由调用方决定)
         }
         """
         if not sso:
-            return {
-                "ok": False,
-                "hex_reply": "",
-                "status_code": None,
-                "grpc_status": None,
-                "error": "缺少 sso",
-            }
+            return _error_result("缺少 sso")
         if not sso_rw:
-            return {
-                "ok": False,
-                "hex_reply": "",
-                "status_code": None,
-                "grpc_status": None,
-                "error": "缺少 sso-rw",
-            }
-
-        url = "https://accounts.x.ai/auth_mgmt.AuthManagement/SetTosAcceptedVersion"
-
-        cookies = {
-            "sso": sso,
-            "sso-rw": sso_rw,
-        }
-        clearance = (cf_clearance if cf_clearance is not None else self.cf_clearance).strip()
-        if clearance:
-            cookies["cf_clearance"] = clearance
-
-        headers = {
-            "content-type": "application/grpc-web+proto",
-            "origin": "https://accounts.x.ai",
-            "referer": "https://accounts.x.ai/accept-tos",
-            "x-grpc-web": "1",
-            "user-agent": user_agent or DEFAULT_USER_AGENT,
-        }
+            return _error_result("缺少 sso-rw")
 
-        data = (
-            b"\x00\x00\x00\x00"  # 头部
-            b"\x02"  # 长度
-            b"\x10\x01"  # Field 2 = 1
-        )
+        cookies = self._build_cookies(sso, sso_rw, cf_clearance)
+        headers = _build_headers(user_agent or DEFAULT_USER_AGENT, max(1, int(timeout * 1000)))
 
         try:
-            response = requests.post(
-                url,
+            session = _get_session(impersonate or "chrome120")
+            # 连接复用，但不同账号之间不共享 cookie。
+            session.cookies.clear()
+            response = session.post(
+                _TOS_URL,
                 headers=headers,
                 cookies=cookies,
-                data=data,
-                impersonate=impersonate or "chrome120",
-                timeout=timeout,
+                data=_TOS_PAYLOAD,
+                timeout=(min(_CONNECT_TIMEOUT, timeout), timeout),
             )
-            hex_reply = response.content.hex()
-            grpc_status = response.headers.get("grpc-status")
-
-            error = None
-            ok = response.status_code == 200 and (grpc_status in (None, "0"))
-            if response.status_code == 403:
-                error = "403 Forbidden"
-            elif response.status_code != 200:
-                error = f"HTTP {response.status_code}"
-            elif grpc_status not in (None, "0"):
-                error = f"gRPC {grpc_status}"
-
-            return {
-                "ok": ok,
-                "hex_reply": hex_reply,
-                "status_code": response.status_code,
-                "grpc_status": grpc_status,
-                "error": error,
-            }
+            return _parse_response(response)
         except Exception as e:
-            return {
-                "ok": False,
-                "hex_reply": "",
-                "status_code": None,
-                "grpc_status": None,
-                "error": str(e),
-            }
+            if _is_timeout(e):
+                return _error_result(f"timeout: {e}", "DEADLINE_EXCEEDED")
+            return _error_result(str(e))
+
+    async def accept_tos_version_many(
+        self,
+        creds: List[Tuple[str, str]],
+        impersonate: str,
+        user_agent: Optional[str] = None,
+        cf_clearance: Optional[str] = None,
+        timeout: int = 15,
+        max_concurrency: int = _MAX_CONCURRENT_STREAMS,
+    ) -> List[Dict[str, Any]]:
+        """
+        批量同意 TOS：共用一个 AsyncSession，请求通过 HTTP/2 在同一连接上多路复用。
+        creds 为 (sso, sso_rw) 列表，返回结果顺序与之对应，格式同 accept_tos_version。
+
+        各账号的 cookie 只随各自请求发送；Session 的 cookie jar 在每次响应后立即清空，
+        不会把一个账号的 Set-Cookie 带到其他账号的请求中。
+        """
+        from curl_cffi import requests
+
+        headers = _build_headers(user_agent or DEFAULT_USER_AGENT, max(1, int(timeout * 1000)))
+        semaphore = asyncio.Semaphore(max(1, int(max_concurrency)))
+
+        async with requests.AsyncSession(impersonate=impersonate or "chrome120") as session:
+
+            async def _accept(sso: str, sso_rw: str) -> Dict[str, Any]:
+                if not sso:
+                    return _error_result("缺少 sso")
+                if not sso_rw:
+                    return _error_result("缺少 sso-rw")
+                try:
+                    async with semaphore:
+                        try:
+                            response = await session.post(
+                                _TOS_URL,
+                                headers=headers,
+                                cookies=self._build_cookies(sso, sso_rw, cf_clearance),
+                                data=_TOS_PAYLOAD,
+                                timeout=(min(_CONNECT_TIMEOUT, timeout), timeout),
+                            )
+                        finally:
+                            # 响应写入 jar 与此处清空之间没有让出点，其他并发请求发出时 jar 始终为空
+                            session.cookies.clear()
+                    return _parse_response(response)
+                except Exception as e:
+                    if _is_timeout(e):
+                        return _error_result(f"timeout: {e}", "DEADLINE_EXCEEDED")
+                    return _error_result(str(e))
+
+            return list(await asyncio.gather(*(_accept(sso, sso_rw) for sso, sso_rw in creds)))
+
+
+@lru_cache(maxsize=1)
+def get_user_agreement_service() -> UserAgreementService:
+    """共享的 UserAgreementService 实例。"""
+    return UserAgreementService()
@@ -1,11 +1,17 @@
 """Local Turnstile solver process manager."""
 from __future__ import annotations
 
+import concurrent.futures
+import hashlib
+import json
+import os
 import socket
 import subprocess
 import sys
+import threading
 import time
 from dataclasses import dataclass
+from functools import cached_property, lru_cache
 from pathlib import Path
 from typing import Optional
 from urllib.parse import urlparse
@@ -13,15 +19,140 @@ from urllib.parse import urlparse
 from app.core.logger import logger
 
 
+def _child_process_kwargs() -> dict:
+    """Popen options for helper children: no inherited fds, no console window."""
+    kwargs: dict = {"close_fds": True}
+    if sys.platform.startswith("win"):
+        kwargs["creationflags"] = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+    else:
+        kwargs["start_new_session"] = True
+    return kwargs
+
+
+# Successful (python_exe, modules) import probes. Failures are not cached so that
+# installing the solver dependencies takes effect without restarting the server.
+_import_probe_ok: set[tuple[str, tuple[str, ...]]] = set()
+_import_probe_lock = threading.Lock()
+
+
+def _probe_import(python_exe: str, modules: tuple[str, ...]) -> bool:
+    """Check whether a python executable can import given modules (memoized on success)."""
+    key = (python_exe, modules)
+    with _import_probe_lock:
+        if key in _import_probe_ok:
+            return True
+    code = "; ".join([f"import {m}" for m in modules])
+    try:
+        subprocess.check_call(
+            [python_exe, "-c", code],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            **_child_process_kwargs(),
+        )
+    except Exception:
+        return False
+    with _import_probe_lock:
+        _import_probe_ok.add(key)
+    return True
+
+
+@lru_cache(maxsize=4)
+def _where_python(path_env: str, pathext_env: str) -> tuple[str, ...]:
+    """Emulate `where python`: every python executable found along PATH, in order."""
+    exts = [e for e in pathext_env.split(os.pathsep) if e] + [""]
+    paths: list[str] = []
+    seen: set[str] = set()
+    for d in path_env.split(os.pathsep):
+        d = d.strip().strip('"')
+        if not d:
+            continue
+        for ext in exts:
+            p = os.path.join(d, "python" + ext)
+            key = p.lower()
+            if key in seen:
+                continue
+            seen.add(key)
+            if os.path.isfile(p):
+                paths.append(p)
+    return tuple(paths)
+
+
+def _playwright_browsers_dir() -> str:
+    """Directory where Playwright keeps its downloaded browsers."""
+    custom = os.environ.get("PLAYWRIGHT_BROWSERS_PATH", "").strip()
+    if custom and custom != "0":
+        return os.path.abspath(os.path.expanduser(custom))
+    if sys.platform.startswith("win"):
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser(r"~\AppData\Local")
+        return os.path.join(base, "ms-playwright")
+    if sys.platform == "darwin":
+        return os.path.expanduser("~/Library/Caches/ms-playwright")
+    return os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "ms-playwright")
+
+
+def _playwright_chromium_dirs(python_exe: str) -> list[str]:
+    """Install directories the interpreter's Playwright expects for ``chromium``.
+
+    Asks ``playwright install --dry-run`` so the revision matches the installed
+    package and the headless shell used by ``--headless_mode old`` is included.
+    Returns an empty list when the answer is unavailable.
+    """
+    try:
+        out = subprocess.run(
+            [python_exe, "-m", "playwright", "install", "--dry-run", "chromium"],
+            capture_output=True,
+            text=True,
+            timeout=30,
+        ).stdout
+    except Exception:
+        return []
+    return [
+        line.split(":", 1)[1].strip()
+        for line in out.splitlines()
+        if line.strip().lower().startswith("install location:")
+    ]
+
+
+def _playwright_chromium_installed(dirs: list[str]) -> bool:
+    return bool(dirs) and all(os.path.isdir(d) and os.listdir(d) for d in dirs)
+
+
+@lru_cache(maxsize=1)
+def _ensure_locks_dir(root: Path) -> Path:
+    """Create ``<root>/data/.locks`` once per process and return it."""
+    lock_dir = root / "data" / ".locks"
+    lock_dir.mkdir(parents=True, exist_ok=True)
+    return lock_dir
+
+
+def _port_open(host: str, port: int, timeout: float = 0.1) -> bool:
+    """Single quick connect attempt to see whether something already listens on the port."""
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except Exception:
+        return False
+
+
 def _wait_for_port(host: str, port: int, timeout: float = 20.0) -> bool:
-    deadline = time.time() + timeout
-    while time.time() < deadline:
+    """Wait until ``host:port`` accepts connections, backing off from 20 ms up to 500 ms."""
+    deadline = time.monotonic() + timeout
+    delay = 0.02
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
         try:
-            with socket.create_connection((host, port), timeout=1):
+            with socket.create_connection((host, port), timeout=min(0.2, remaining)):
                 return True
         except Exception:
-            time.sleep(0.5)
-    return False
+            pass
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, 0.5)
 
 
 @dataclass
@@ -42,51 +173,76 @@ class TurnstileSolverProcess:
         self._started_by_us = False
         self._repo_root = Path(__file__).resolve().parents[3]
         self._python_exe: str = sys.executable
+        self._fallback_python_exe: str = sys.executable
         self._actual_browser_type: str = config.browser_type
 
+    @cached_property
+    def _lock_dir(self) -> Path:
+        return _ensure_locks_dir(self._repo_root)
+
+    @cached_property
     def _script_path(self) -> Path:
         return self._repo_root / "scripts" / "turnstile_solver" / "api_solver.py"
 
-    def _can_import(self, python_exe: str, modules: list[str]) -> bool:
-        """Check whether a python executable can import given modules."""
-        code = "; ".join([f"import {m}" for m in modules])
+    @cached_property
+    def _runtime_cache_path(self) -> Path:
+        return self._lock_dir / "solver_runtime.json"
+
+    @staticmethod
+    def _runtime_cache_key(desired: str) -> str:
+        raw = "\0".join([os.environ.get("PATH", ""), sys.executable, desired])
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _load_cached_runtime(self, key: str) -> bool:
+        """Restore a previously selected runtime if PATH/interpreter/browser are unchanged."""
         try:
-            subprocess.check_call(
-                [python_exe, "-c", code],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-            )
-            return True
+            with open(self._runtime_cache_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
         except Exception:
             return False
+        if not isinstance(cached, dict) or cached.get("key") != key:
+            return False
+        python_exe = cached.get("python_exe")
+        fallback_exe = cached.get("fallback_python_exe")
+        browser = cached.get("browser")
+        if not (isinstance(python_exe, str) and isinstance(fallback_exe, str) and isinstance(browser, str)):
+            return False
+        if not (os.path.isfile(python_exe) and os.path.isfile(fallback_exe)):
+            return False
+        self._python_exe = python_exe
+        self._fallback_python_exe = fallback_exe
+        self._actual_browser_type = browser
+        return True
+
+    def _save_cached_runtime(self, key: str) -> None:
+        data = {
+            "key": key,
+            "python_exe": self._python_exe,
+            "fallback_python_exe": self._fallback_python_exe,
+            "browser": self._actual_browser_type,
+        }
+        try:
+            tmp = self._runtime_cache_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(data), encoding="utf-8")
+            os.replace(tmp, self._runtime_cache_path)
+        except Exception as exc:
+            logger.debug("Failed to persist solver runtime: {}", exc)
+
+    def _clear_cached_runtime(self) -> None:
+        try:
+            os.remove(self._runtime_cache_path)
+        except OSError:
+            pass
+
+    def _can_import(self, python_exe: str, modules: list[str]) -> bool:
+        """Check whether a python executable can import given modules."""
+        return _probe_import(python_exe, tuple(modules))
 
     def _windows_where_python(self) -> list[str]:
-        """List python.exe candidates on Windows using `where python` (best-effort)."""
+        """List python.exe candidates on Windows by walking PATH (best-effort)."""
         if not sys.platform.startswith("win"):
             return []
-        try:
-            out = subprocess.check_output(
-                ["where", "python"],
-                stderr=subprocess.DEVNULL,
-                text=True,
-                encoding="utf-8",
-                errors="ignore",
-            )
-        except Exception:
-            return []
-
-        paths: list[str] = []
-        seen: set[str] = set()
-        for line in out.splitlines():
-            p = (line or "").strip().strip('"')
-            if not p:
-                continue
-            key = p.lower()
-            if key in seen:
-                continue
-            seen.add(key)
-            paths.append(p)
-        return paths
+        return list(_where_python(os.environ.get("PATH", ""), os.environ.get("PATHEXT", ".EXE")))
 
     def _select_runtime(self) -> None:
         """Pick python executable + browser type to run solver with.
@@ -104,10 +260,14 @@ class TurnstileSolverProcess:
         if desired not in {"chromium", "chrome", "msedge", "camoufox"}:
             desired = "chromium"
 
+        cache_key = self._runtime_cache_key(desired)
+        if self._load_cached_runtime(cache_key):
+            return
+
         # Collect python candidates.
         #
         # NOTE: When the API server runs under `uv run`, `python` on PATH usually points to
-        # the venv python, not the system python. On Windows, use `where python` to discover
+        # the venv python, not the system python. On Windows, walk PATH (like `where python`) to discover
         # other interpreters (e.g. Python312) where users installed camoufox/patchright.
         candidates: list[str] = [sys.executable]
         for p in self._windows_where_python():
@@ -127,43 +287,51 @@ class TurnstileSolverProcess:
             dedup.append(p)
         candidates = dedup
 
+        module_sets: list[tuple[str, ...]] = []
+        if desired == "camoufox":
+            module_sets += [("quart", "camoufox", "patchright"), ("quart", "camoufox", "playwright")]
+        module_sets += [("quart", "patchright"), ("quart", "playwright")]
+
+        # Probe every (interpreter, module set) pair concurrently; each probe mostly
+        # waits on a child interpreter, so the total cost is roughly the slowest probe.
+        grid = [(exe, modules) for modules in module_sets for exe in candidates]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(8, len(grid))) as executor:
+            outcomes = list(executor.map(lambda item: _probe_import(*item), grid))
+        probe_results = dict(zip(grid, outcomes))
+
         def _pick_with(modules: list[str]) -> str | None:
             for exe in candidates:
-                if self._can_import(exe, modules):
+                if probe_results[(exe, tuple(modules))]:
                     return exe
             return None
 
+        # For chromium/chrome/msedge, prefer patchright if available. Last resort is the
+        # current interpreter (may fail fast with a clear error from the solver process).
+        # This is also the ready-made fallback if camoufox fails to start.
+        chromium_exe = _pick_with(["quart", "patchright"]) or _pick_with(["quart", "playwright"])
+        # Only persist selections backed by a successful probe, so a later dependency
+        # install is picked up instead of pinning the last-resort interpreter.
+        persist = chromium_exe is not None
+        chromium_exe = chromium_exe or sys.executable
+        self._fallback_python_exe = chromium_exe
+
         self._actual_browser_type = desired
+        self._python_exe = chromium_exe
 
         if desired == "camoufox":
             # Prefer patchright if possible.
-            exe = _pick_with(["quart", "camoufox", "patchright"])
-            if exe:
-                self._python_exe = exe
-                return
-
-            exe = _pick_with(["quart", "camoufox", "playwright"])
+            exe = _pick_with(["quart", "camoufox", "patchright"]) or _pick_with(["quart", "camoufox", "playwright"])
             if exe:
                 self._python_exe = exe
-                return
-
-            # No camoufox in any known interpreter; fallback to chromium.
-            logger.warning("Camoufox not available. Falling back solver browser to chromium.")
-            self._actual_browser_type = "chromium"
+                persist = True
+            else:
+                # No camoufox in any known interpreter; fallback to chromium.
+                logger.warning("Camoufox not available. Falling back solver browser to chromium.")
+                self._actual_browser_type = "chromium"
+                persist = False
 
-        # For chromium/chrome/msedge, prefer patchright if available.
-        exe = _pick_with(["quart", "patchright"])
-        if exe:
-            self._python_exe = exe
-            return
-
-        exe = _pick_with(["quart", "playwright"])
-        if exe:
-            self._python_exe = exe
-            return
-
-        # Last resort: current interpreter (may fail fast with a clear error from the solver process).
-        self._python_exe = sys.executable
+        if persist:
+            self._save_cached_runtime(cache_key)
 
     def _ensure_playwright_browsers(self, python_exe: str) -> None:
         """Ensure Playwright browser binaries exist (best-effort).
@@ -174,10 +342,22 @@ class TurnstileSolverProcess:
         if self._actual_browser_type != "chromium":
             return
 
-        lock_dir = self._repo_root / "data" / ".locks"
-        lock_dir.mkdir(parents=True, exist_ok=True)
-        lock_path = lock_dir / "playwright_chromium_v1.lock"
-        if lock_path.exists():
+        # The lock is scoped to the browsers directory, so pointing
+        # PLAYWRIGHT_BROWSERS_PATH elsewhere triggers a fresh check.
+        browsers_dir = _playwright_browsers_dir()
+        dir_key = hashlib.sha1(browsers_dir.encode("utf-8")).hexdigest()[:12]
+        lock_path = self._lock_dir / f"playwright_chromium_v2_{dir_key}.lock"
+        # The lock records the directories that were verified; it is only
+        # trusted while they are all still present.
+        try:
+            if _playwright_chromium_installed(json.loads(lock_path.read_text(encoding="utf-8"))):
+                return
+        except Exception:
+            pass
+
+        dirs = _playwright_chromium_dirs(python_exe)
+        if _playwright_chromium_installed(dirs):
+            lock_path.write_text(json.dumps(dirs), encoding="utf-8")
             return
 
         try:
@@ -188,12 +368,15 @@ class TurnstileSolverProcess:
                 args.append("--with-deps")
             args.append("chromium")
             subprocess.check_call(args, cwd=str(self._repo_root))
-            lock_path.write_text(str(time.time()), encoding="utf-8")
+            dirs = _playwright_chromium_dirs(python_exe)
+            if _playwright_chromium_installed(dirs):
+                lock_path.write_text(json.dumps(dirs), encoding="utf-8")
         except Exception as exc:
             # Don't create lock file; let next run retry.
             raise RuntimeError(f"Playwright browser install failed: {exc}") from exc
 
-    def _parse_host_port(self) -> tuple[str, int]:
+    @cached_property
+    def _host_port(self) -> tuple[str, int]:
         parsed = urlparse(self.config.url)
         host = parsed.hostname or "127.0.0.1"
         port = parsed.port or 5072
@@ -203,11 +386,12 @@ class TurnstileSolverProcess:
         if not self.config.auto_start:
             return
 
-        host, port = self._parse_host_port()
+        host, port = self._host_port
 
         def _spawn() -> None:
-            script = self._script_path()
-            if not script.exists():
+            script = self._script_path
+            script_str = str(script)
+            if not os.path.isfile(script_str):
                 raise RuntimeError(f"Solver script not found: {script}")
 
             # Ensure Playwright browsers are present before starting the solver process.
@@ -215,7 +399,7 @@ class TurnstileSolverProcess:
 
             cmd = [
                 self._python_exe,
-                str(script),
+                script_str,
                 "--browser_type",
                 self._actual_browser_type,
                 "--thread",
@@ -226,9 +410,15 @@ class TurnstileSolverProcess:
             cmd += ["--host", host, "--port", str(port)]
 
             logger.info("Starting Turnstile solver: {}", " ".join(cmd))
+            # Keep solver output visible only in debug mode.
+            output = None if self.config.debug else subprocess.DEVNULL
             self._process = subprocess.Popen(
                 cmd,
                 cwd=str(script.parent),
+                stdin=subprocess.DEVNULL,
+                stdout=output,
+                stderr=output,
+                **_child_process_kwargs(),
             )
             self._started_by_us = True
 
@@ -250,7 +440,7 @@ class TurnstileSolverProcess:
             self._actual_browser_type,
         )
 
-        if _wait_for_port(host, port, timeout=1.0):
+        if _port_open(host, port):
             logger.info("Turnstile solver already running at {}:{}", host, port)
             self._started_by_us = False
             return
@@ -259,6 +449,8 @@ class TurnstileSolverProcess:
             _spawn()
             return
         except Exception as exc:
+            # Re-select from scratch next time rather than reusing a runtime that failed.
+            self._clear_cached_runtime()
             # camoufox is not always stable/available across environments (notably Docker).
             # Fall back to chromium instead of failing the whole auto-register workflow.
             if self._actual_browser_type != "camoufox":
@@ -270,7 +462,7 @@ class TurnstileSolverProcess:
                 pass
             self.config.browser_type = "chromium"
             self._actual_browser_type = "chromium"
-            self._select_runtime()
+            self._python_exe = self._fallback_python_exe
             logger.info(
                 "Turnstile solver runtime selected: python={} browser_type={}",
                 self._python_exe,
@@ -282,13 +474,21 @@ class TurnstileSolverProcess:
         if not self._process or not self._started_by_us:
             return
 
+        process = self._process
         try:
             logger.info("Stopping Turnstile solver...")
-            self._process.terminate()
-            self._process.wait(timeout=10)
+            process.terminate()
+            # Give it ~2s to exit gracefully, then escalate to kill.
+            for _ in range(40):
+                if process.poll() is not None:
+                    break
+                time.sleep(0.05)
+            else:
+                process.kill()
+                process.wait(timeout=2)
         except Exception:
             try:
-                self._process.kill()
+                process.kill()
             except Exception:
                 pass
         finally:
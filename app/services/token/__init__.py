@@ -1,17 +1,40 @@
 """Token 服务模块"""
 
-from app.services.token.models import (
-    TokenInfo,
-    TokenStatus,
-    TokenPoolStats,
-    EffortType,
-    DEFAULT_QUOTA,
-    EFFORT_COST
-)
-from app.services.token.pool import TokenPool
-from app.services.token.manager import TokenManager, get_token_manager
-from app.services.token.service import TokenService
-from app.services.token.scheduler import TokenRefreshScheduler, get_scheduler
+import importlib
+
+# 按需导入（PEP 562）：只在首次访问时加载对应子模块
+_LAZY = {
+    # Models
+    "TokenInfo": "app.services.token.models",
+    "TokenStatus": "app.services.token.models",
+    "TokenPoolStats": "app.services.token.models",
+    "EffortType": "app.services.token.models",
+    "DEFAULT_QUOTA": "app.services.token.models",
+    "EFFORT_COST": "app.services.token.models",
+    # Core
+    "TokenPool": "app.services.token.pool",
+    "TokenManager": "app.services.token.manager",
+    # API
+    "TokenService": "app.services.token.service",
+    "get_token_manager": "app.services.token.manager",
+    # Scheduler
+    "TokenRefreshScheduler": "app.services.token.scheduler",
+    "get_scheduler": "app.services.token.scheduler",
+}
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
+
 
 __all__ = [
     # Models
@@ -2,19 +2,40 @@
 
 import asyncio
 import time
-from datetime import datetime
-from typing import Dict, List, Optional
+from collections import deque
+
+import orjson
+from typing import Dict, List, Optional, Set, Tuple
 
 from app.core.logger import logger
-from app.services.token.models import TokenInfo, EffortType, TokenPoolStats, FAIL_THRESHOLD, TokenStatus
+from app.services.token.models import TokenInfo, EffortType, TokenPoolStats, FAIL_THRESHOLD
 from app.core.storage import get_storage
-from app.core.config import get_config
+from app.core.config import config, get_config
 from app.services.token.pool import TokenPool
+from app.services.grok.usage import UsageService
 
 # 批量刷新配置
 REFRESH_INTERVAL_HOURS = 8
-REFRESH_BATCH_SIZE = 10
 REFRESH_CONCURRENCY = 5
+# 单个 token 遇到 429 时的退避时间 (秒)
+REFRESH_RATE_LIMIT_BACKOFF = 1.0
+# 合并中的用量查询，跟随者最长等待时间 (秒)
+SYNC_COALESCE_TIMEOUT = 5.0
+# 同时进行的上游用量查询上限，超出时直接走本地预估
+SYNC_MAX_INFLIGHT = 32
+# 用量查询对冲：近期耗时样本数、启用对冲所需最少样本、对冲延迟下限 (秒)
+USAGE_LATENCY_WINDOW = 128
+USAGE_HEDGE_MIN_SAMPLES = 20
+USAGE_HEDGE_MIN_DELAY = 0.2
+# 保存失败后的重试间隔上限 (秒)
+SAVE_RETRY_MAX_DELAY = 30.0
+# 全量保存缓冲区超过该大小后不再复用，避免长期占用内存
+SAVE_BUFFER_MAX_BYTES = 1024 * 1024
+
+
+def _strip_sso(token: str) -> str:
+    """去掉 sso= 前缀（仅检查开头，不扫描整个字符串）"""
+    return token[4:] if token.startswith("sso=") else token
 
 
 class TokenManager:
@@ -25,12 +46,28 @@ class TokenManager:
     
     def __init__(self):
         self.pools: Dict[str, TokenPool] = {}
+        # 扁平索引: token -> (pool_name, TokenInfo)
+        self._index: Dict[str, Tuple[str, TokenInfo]] = {}
         self.initialized = False
         self._save_lock = asyncio.Lock()
-        self._dirty = False
+        # 待增量保存的 (pool_name, token)
+        self._dirty_keys: Set[Tuple[str, str]] = set()
+        self._save_event = asyncio.Event()
         self._save_task: Optional[asyncio.Task] = None
+        self._save_buf = bytearray()
         self._save_delay = 0.5
         self._last_reload_at = 0.0
+        # 已解析的配置值: key -> (config.version, value)
+        self._cfg_cache: Dict[str, Tuple[int, float]] = {}
+        # UsageService 在构造时读取代理/超时配置，按配置版本复用
+        self._usage_service: Optional[UsageService] = None
+        self._usage_service_version = -1
+        # 进行中的用量查询: (token, model_name) -> Future
+        self._inflight_sync: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._sync_inflight_count = 0
+        # 近期用量查询耗时，P95 作为对冲延迟（样本不足时为 None，不对冲）
+        self._usage_latency: deque = deque(maxlen=USAGE_LATENCY_WINDOW)
+        self._usage_hedge_delay: Optional[float] = None
     
     @classmethod
     async def get_instance(cls) -> "TokenManager":
@@ -69,16 +106,17 @@ class TokenManager:
                             # 统一存储裸 token
                             if isinstance(token_data, dict):
                                 raw_token = token_data.get("token")
-                                if isinstance(raw_token, str) and raw_token.startswith("sso="):
-                                    token_data["token"] = raw_token[4:]
-                            token_info = TokenInfo(**token_data)
+                                if isinstance(raw_token, str):
+                                    token_data["token"] = _strip_sso(raw_token)
+                            token_info = TokenInfo.from_dict(token_data)
                             pool.add(token_info)
                         except Exception as e:
                             logger.warning(f"Failed to load token in pool '{pool_name}': {e}")
                             continue
                     pool._rebuild_index()
                     self.pools[pool_name] = pool
-                    
+
+                self._rebuild_token_index()
                 self.initialized = True
                 self._last_reload_at = time.monotonic()
                 total = sum(p.count() for p in self.pools.values())
@@ -86,73 +124,223 @@ class TokenManager:
             except Exception as e:
                 logger.error(f"Failed to initialize TokenManager: {e}")
                 self.pools = {}
+                self._index = {}
                 self.initialized = True
 
+    def _rebuild_token_index(self):
+        """重建 token -> (pool_name, TokenInfo) 索引（同一 token 以先出现的池为准）"""
+        index: Dict[str, Tuple[str, TokenInfo]] = {}
+        for pool_name, pool in self.pools.items():
+            for info in pool:
+                index.setdefault(info.token, (pool_name, info))
+        self._index = index
+
     async def reload(self):
         """重新加载 Token 池数据"""
         async with self.__class__._lock:
             self.initialized = False
             await self._load()
 
-    async def reload_if_stale(self):
-        """在多 worker 场景下保持短周期一致性"""
-        interval = get_config("token.reload_interval_sec", 30)
+    def _cfg_float(self, key: str, default: float) -> float:
+        """读取数值配置，配置版本未变化时直接返回缓存"""
+        version = config.version
+        cached = self._cfg_cache.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        value = get_config(key, default)
         try:
-            interval = float(interval)
+            value = float(value)
         except Exception:
-            interval = 30.0
+            value = float(default)
+        self._cfg_cache[key] = (version, value)
+        return value
+
+    def _get_usage_service(self) -> UsageService:
+        """复用 UsageService 实例，配置变更后重建"""
+        if self._usage_service is None or self._usage_service_version != config.version:
+            self._usage_service = UsageService()
+            self._usage_service_version = config.version
+        return self._usage_service
+
+    async def _fetch_usage(self, token_str: str, raw_token: str, model_name: str) -> Optional[dict]:
+        """
+        查询用量，同一 token/模型的并发查询合并为一次上游请求
+        
+        上游查询数达到 SYNC_MAX_INFLIGHT 时不再排队，直接返回 None（调用方降级到本地预估）
+        """
+        key = (raw_token, model_name)
+        fut = self._inflight_sync.get(key)
+        if fut is not None:
+            return await asyncio.wait_for(asyncio.shield(fut), SYNC_COALESCE_TIMEOUT)
+
+        if self._sync_inflight_count >= SYNC_MAX_INFLIGHT:
+            logger.debug(f"Token {raw_token[:10]}...: usage sync saturated, skip API query")
+            return None
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight_sync[key] = fut
+        self._sync_inflight_count += 1
+        try:
+            result = await self._hedged_usage(token_str, model_name)
+            fut.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            # 领头请求被取消（如客户端断开）时，跟随者收到普通异常并降级到本地预估，
+            # 只有领头请求自身继续抛出 CancelledError
+            fut.set_exception(RuntimeError("leader cancelled"))
+            fut.exception()
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            # 无跟随者时避免 "exception was never retrieved" 警告
+            fut.exception()
+            raise
+        finally:
+            self._sync_inflight_count -= 1
+            self._inflight_sync.pop(key, None)
+
+    def _record_usage_latency(self, elapsed: float):
+        samples = self._usage_latency
+        samples.append(elapsed)
+        if len(samples) >= USAGE_HEDGE_MIN_SAMPLES:
+            p95 = sorted(samples)[int(len(samples) * 0.95)]
+            self._usage_hedge_delay = max(p95, USAGE_HEDGE_MIN_DELAY)
+
+    async def _hedged_usage(self, token_str: str, model_name: str) -> Optional[dict]:
+        """上游用量查询；超过近期 P95 耗时仍未返回时发起一次备份请求，取先成功者"""
+        service = self._get_usage_service()
+        started = time.monotonic()
+        delay = self._usage_hedge_delay
+        if delay is None:
+            result = await service.get(token_str, model_name=model_name)
+            self._record_usage_latency(time.monotonic() - started)
+            return result
+
+        tasks = [asyncio.ensure_future(service.get(token_str, model_name=model_name))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                tasks.append(asyncio.ensure_future(service.get(token_str, model_name=model_name)))
+            error: Optional[BaseException] = None
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    result = await next_done
+                except Exception as e:
+                    error = e
+                    continue
+                self._record_usage_latency(time.monotonic() - started)
+                return result
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    # 标记败者的异常已检索，避免 "exception was never retrieved" 警告
+                    task.exception()
+
+    async def reload_if_stale(self):
+        """在多 worker 场景下保持短周期一致性"""
+        interval = self._cfg_float("token.reload_interval_sec", 30)
         if interval <= 0:
             return
         if time.monotonic() - self._last_reload_at < interval:
             return
         await self.reload()
 
-    async def _save(self):
-        """保存变更"""
+    async def _save(self, full: bool = True) -> bool:
+        """
+        保存变更
+        
+        Args:
+            full: True 全量重写；False 仅保存 _dirty_keys 中的 Token，
+                  后端不支持增量写入时回退到全量重写
+                  
+        Returns:
+            是否保存成功（无需保存也视为成功）
+        """
         async with self._save_lock:
+            dirty_keys, self._dirty_keys = self._dirty_keys, set()
+            if not full and not dirty_keys:
+                return True
             try:
-                data = {}
-                for pool_name, pool in self.pools.items():
-                    data[pool_name] = [
-                        info.model_dump() for info in pool.list()
-                    ]
-                
                 storage = get_storage()
                 async with storage.acquire_lock("tokens_save", timeout=10):
+                    if not full:
+                        deltas = []
+                        for pool_name, token_str in dirty_keys:
+                            pool = self.pools.get(pool_name)
+                            info = pool.get(token_str) if pool else None
+                            if info:
+                                deltas.append((pool_name, info.dump(), info.to_json_bytes()))
+                        if await storage.save_token_deltas(deltas):
+                            return True
+
+                    if storage.supports_raw_tokens:
+                        await storage.save_tokens_raw(self._serialize_pools())
+                        return True
+
+                    data = {}
+                    for pool_name, pool in self.pools.items():
+                        data[pool_name] = [
+                            info.dump() for info in pool.list()
+                        ]
                     await storage.save_tokens(data)
+                return True
             except Exception as e:
+                # 保留未落盘的变更，等待下次保存
+                self._dirty_keys |= dirty_keys
                 logger.error(f"Failed to save tokens: {e}")
+                return False
+
+    def _serialize_pools(self) -> bytes:
+        """将所有池直接拼接为 JSON (复用各 Token 的序列化缓存)"""
+        buf = self._save_buf
+        buf.clear()
+        buf += b"{"
+        for i, (pool_name, pool) in enumerate(self.pools.items()):
+            if i:
+                buf += b","
+            buf += orjson.dumps(pool_name)
+            buf += b":["
+            for j, info in enumerate(pool):
+                if j:
+                    buf += b","
+                buf += info.to_json_bytes()
+            buf += b"]"
+        buf += b"}"
+        blob = bytes(buf)
+        if len(buf) > SAVE_BUFFER_MAX_BYTES:
+            self._save_buf = bytearray()
+        return blob
 
     def _schedule_save(self):
         """合并高频保存请求，减少写入开销"""
-        delay_ms = get_config("token.save_delay_ms", 500)
-        try:
-            delay_ms = float(delay_ms)
-        except Exception:
-            delay_ms = 500
+        delay_ms = self._cfg_float("token.save_delay_ms", 500)
         self._save_delay = max(0.0, delay_ms / 1000.0)
-        self._dirty = True
-        if self._save_delay == 0:
-            if self._save_task and not self._save_task.done():
-                return
-            self._save_task = asyncio.create_task(self._save())
-            return
-        if self._save_task and not self._save_task.done():
-            return
-        self._save_task = asyncio.create_task(self._flush_loop())
+        self._save_event.set()
+        if self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.create_task(self._flush_loop())
 
     async def _flush_loop(self):
-        try:
-            while True:
-                await asyncio.sleep(self._save_delay)
-                if not self._dirty:
-                    break
-                self._dirty = False
-                await self._save()
-        finally:
-            self._save_task = None
-            if self._dirty:
-                self._schedule_save()
+        """
+        常驻保存协程：同一窗口内的多次变更只触发一次保存
+        空闲时只等待事件，不会定时唤醒；保存失败时按指数退避自行重试
+        """
+        retry_delay = 0.0
+        while True:
+            await self._save_event.wait()
+            delay = max(self._save_delay, retry_delay)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._save_event.clear()
+            if await self._save(full=False):
+                retry_delay = 0.0
+            else:
+                # 兜底：即使之后没有新的变更，也会重试未落盘的数据
+                retry_delay = min(max(retry_delay * 2, 1.0), SAVE_RETRY_MAX_DELAY)
+                self._save_event.set()
+
     def get_token(self, pool_name: str = "ssoBasic") -> Optional[str]:
         """
         获取可用 Token
@@ -173,10 +361,7 @@ class TokenManager:
             logger.warning(f"No available token in pool '{pool_name}'")
             return None
             
-        token = token_info.token
-        if token.startswith("sso="):
-            return token[4:]
-        return token
+        return _strip_sso(token_info.token)
 
     async def consume(self, token_str: str, effort: EffortType = EffortType.LOW) -> bool:
         """
@@ -189,15 +374,16 @@ class TokenManager:
         Returns:
             是否成功
         """
-        raw_token = token_str.replace("sso=", "")
+        raw_token = _strip_sso(token_str)
         
-        for pool in self.pools.values():
-            token = pool.get(raw_token)
-            if token:
-                consumed = token.consume(effort)
-                logger.debug(f"Token {raw_token[:10]}...: consumed {consumed} quota, use_count={token.use_count}")
-                self._schedule_save()
-                return True
+        entry = self._index.get(raw_token)
+        if entry:
+            pool_name, token = entry
+            consumed = token.consume(effort)
+            logger.debug(f"Token {raw_token[:10]}...: consumed {consumed} quota, use_count={token.use_count}")
+            self._dirty_keys.add((pool_name, raw_token))
+            self._schedule_save()
+            return True
         
         logger.warning(f"Token {raw_token[:10]}...: not found for consumption")
         return False
@@ -225,25 +411,18 @@ class TokenManager:
         Returns:
             是否成功
         """
-        raw_token = token_str.replace("sso=", "")
+        raw_token = _strip_sso(token_str)
         
         # 查找 Token 对象
-        target_token: Optional[TokenInfo] = None
-        for pool in self.pools.values():
-            target_token = pool.get(raw_token)
-            if target_token:
-                break
-        
-        if not target_token:
+        entry = self._index.get(raw_token)
+        if not entry:
             logger.warning(f"Token {raw_token[:10]}...: not found for sync")
             return False
+        target_pool, target_token = entry
 
         # 尝试 API 同步
         try:
-            from app.services.grok.usage import UsageService
-            
-            usage_service = UsageService()
-            result = await usage_service.get(token_str, model_name=model_name)
+            result = await self._fetch_usage(token_str, raw_token, model_name)
             
             if result and "remainingTokens" in result:
                 old_quota = target_token.quota
@@ -258,6 +437,7 @@ class TokenManager:
                     f"{old_quota} -> {new_quota} (consumed: {consumed}, use_count: {target_token.use_count})"
                 )
                 
+                self._dirty_keys.add((target_pool, raw_token))
                 self._schedule_save()
                 return True
                 
@@ -284,23 +464,24 @@ class TokenManager:
         Returns:
             是否成功
         """
-        raw_token = token_str.replace("sso=", "")
+        raw_token = _strip_sso(token_str)
         
-        for pool in self.pools.values():
-            token = pool.get(raw_token)
-            if token:
-                if status_code == 401:
-                    token.record_fail(status_code, reason)
-                    logger.warning(
-                        f"Token {raw_token[:10]}...: recorded 401 failure "
-                        f"({token.fail_count}/{FAIL_THRESHOLD}) - {reason}"
-                    )
-                else:
-                    logger.info(
-                        f"Token {raw_token[:10]}...: non-401 error ({status_code}) - {reason} (not counted)"
-                    )
+        entry = self._index.get(raw_token)
+        if entry:
+            pool_name, token = entry
+            if token.record_fail(status_code, reason):
+                logger.warning(
+                    f"Token {raw_token[:10]}...: recorded 401 failure "
+                    f"({token.fail_count}/{FAIL_THRESHOLD}) - {reason}"
+                )
+                self._dirty_keys.add((pool_name, raw_token))
                 self._schedule_save()
-                return True
+            else:
+                # 未计入失败，无需保存
+                logger.info(
+                    f"Token {raw_token[:10]}...: non-401 error ({status_code}) - {reason} (not counted)"
+                )
+            return True
         
         logger.warning(f"Token {raw_token[:10]}...: not found for failure record")
         return False
@@ -324,25 +505,28 @@ class TokenManager:
             
         pool = self.pools[pool_name]
         
-        token = token[4:] if token.startswith("sso=") else token
+        token = _strip_sso(token)
         if pool.get(token):
             logger.warning(f"Pool '{pool_name}': token already exists")
             return False
             
-        pool.add(TokenInfo(token=token))
+        info = TokenInfo(token=token)
+        pool.add(info)
+        self._index.setdefault(token, (pool_name, info))
         await self._save()
         logger.info(f"Pool '{pool_name}': token added")
         return True
 
     async def mark_asset_clear(self, token: str) -> bool:
         """记录在线资产清理时间"""
-        raw_token = token[4:] if token.startswith("sso=") else token
-        for pool in self.pools.values():
-            info = pool.get(raw_token)
-            if info:
-                info.last_asset_clear_at = int(datetime.now().timestamp() * 1000)
-                self._schedule_save()
-                return True
+        raw_token = _strip_sso(token)
+        entry = self._index.get(raw_token)
+        if entry:
+            pool_name, info = entry
+            info.mark_asset_clear()
+            self._dirty_keys.add((pool_name, raw_token))
+            self._schedule_save()
+            return True
         return False
 
     async def remove(self, token: str) -> bool:
@@ -357,6 +541,13 @@ class TokenManager:
         """
         for pool_name, pool in self.pools.items():
             if pool.remove(token):
+                self._index.pop(token, None)
+                # 其他池中可能存在同名 token
+                for other_name, other in self.pools.items():
+                    info = other.get(token)
+                    if info:
+                        self._index[token] = (other_name, info)
+                        break
                 await self._save()
                 logger.info(f"Pool '{pool_name}': token removed")
                 return True
@@ -385,15 +576,16 @@ class TokenManager:
         Returns:
             是否成功
         """
-        raw_token = token_str.replace("sso=", "")
+        raw_token = _strip_sso(token_str)
         
-        for pool in self.pools.values():
-            token = pool.get(raw_token)
-            if token:
-                token.reset()
-                await self._save()
-                logger.info(f"Token {raw_token[:10]}...: reset completed")
-                return True
+        entry = self._index.get(raw_token)
+        if entry:
+            pool_name, token = entry
+            token.reset()
+            self._dirty_keys.add((pool_name, raw_token))
+            await self._save(full=False)
+            logger.info(f"Token {raw_token[:10]}...: reset completed")
+            return True
         
         logger.warning(f"Token {raw_token[:10]}...: not found for reset")
         return False
@@ -403,7 +595,7 @@ class TokenManager:
         stats = {}
         for name, pool in self.pools.items():
             pool_stats = pool.get_stats()
-            stats[name] = pool_stats.model_dump()
+            stats[name] = pool_stats.to_dict()
         return stats
     
     def get_pool_tokens(self, pool_name: str = "ssoBasic") -> List[TokenInfo]:
@@ -428,8 +620,6 @@ class TokenManager:
         Returns:
             {"checked": int, "refreshed": int, "recovered": int, "expired": int}
         """
-        from app.services.grok.usage import UsageService
-        
         # 收集需要刷新的 token
         to_refresh: List[TokenInfo] = []
         for pool in self.pools.values():
@@ -443,88 +633,92 @@ class TokenManager:
         
         logger.info(f"Refresh check: found {len(to_refresh)} cooling tokens to refresh")
         
-        # 批量并发刷新
-        semaphore = asyncio.Semaphore(REFRESH_CONCURRENCY)
-        usage_service = UsageService()
-        refreshed = 0
-        recovered = 0
-        expired = 0
+        # 固定数量的 worker 从队列中取任务，完成一个立即取下一个
+        queue: asyncio.Queue[TokenInfo] = asyncio.Queue()
+        for token_info in to_refresh:
+            queue.put_nowait(token_info)
+        usage_service = self._get_usage_service()
+        results: List[dict] = []
         
         async def _refresh_one(token_info: TokenInfo) -> dict:
             """刷新单个 token"""
-            async with semaphore:
-                token_str = token_info.token
-                if token_str.startswith("sso="):
-                    token_str = token_str[4:]
-                
-                # 重试逻辑：最多 2 次重试
-                for retry in range(3):  # 0, 1, 2
-                    try:
-                        result = await usage_service.get(token_str)
-                        
-                        if result and "remainingTokens" in result:
-                            new_quota = result["remainingTokens"]
-                            old_quota = token_info.quota
-                            old_status = token_info.status
-                            
-                            token_info.update_quota(new_quota)
-                            token_info.mark_synced()
-                            
-                            logger.info(
-                                f"Token {token_info.token[:10]}...: refreshed "
-                                f"{old_quota} -> {new_quota}, status: {old_status} -> {token_info.status}"
-                            )
-                            
-                            return {
-                                "recovered": new_quota > 0 and old_quota == 0,
-                                "expired": False
-                            }
+            token_str = _strip_sso(token_info.token)
+            
+            # 重试逻辑：最多 2 次重试
+            for retry in range(3):  # 0, 1, 2
+                try:
+                    result = await usage_service.get(token_str)
+                    
+                    if result and "remainingTokens" in result:
+                        new_quota = result["remainingTokens"]
+                        old_quota = token_info.quota
+                        old_status = token_info.status
                         
+                        token_info.update_quota(new_quota)
                         token_info.mark_synced()
-                        return {"recovered": False, "expired": False}
                         
-                    except Exception as e:
-                        error_str = str(e)
+                        logger.info(
+                            f"Token {token_info.token[:10]}...: refreshed "
+                            f"{old_quota} -> {new_quota}, status: {old_status} -> {token_info.status}"
+                        )
                         
-                        # 检查是否为 401 错误
-                        if "401" in error_str or "Unauthorized" in error_str:
-                            if retry < 2:
-                                logger.warning(
-                                    f"Token {token_info.token[:10]}...: 401 error, "
-                                    f"retry {retry + 1}/2..."
-                                )
-                                await asyncio.sleep(0.5)
-                                continue
-                            else:
-                                # 重试 2 次后仍然 401，标记为 expired
-                                logger.error(
-                                    f"Token {token_info.token[:10]}...: 401 after 2 retries, "
-                                    f"marking as expired"
-                                )
-                                token_info.status = TokenStatus.EXPIRED
-                                token_info.mark_synced()
-                                return {"recovered": False, "expired": True}
-                        else:
+                        return {
+                            "recovered": new_quota > 0 and old_quota == 0,
+                            "expired": False
+                        }
+                    
+                    token_info.mark_synced()
+                    return {"recovered": False, "expired": False}
+                    
+                except Exception as e:
+                    error_str = str(e)
+                    
+                    # 检查是否为 401 错误
+                    if "401" in error_str or "Unauthorized" in error_str:
+                        if retry < 2:
                             logger.warning(
-                                f"Token {token_info.token[:10]}...: refresh failed ({e})"
+                                f"Token {token_info.token[:10]}...: 401 error, "
+                                f"retry {retry + 1}/2..."
                             )
+                            await asyncio.sleep(0.5)
+                            continue
+                        else:
+                            # 重试 2 次后仍然 401，标记为 expired
+                            logger.error(
+                                f"Token {token_info.token[:10]}...: 401 after 2 retries, "
+                                f"marking as expired"
+                            )
+                            token_info.mark_expired()
                             token_info.mark_synced()
-                            return {"recovered": False, "expired": False}
-                
-                token_info.mark_synced()
-                return {"recovered": False, "expired": False}
-        
-        # 批量处理
-        for i in range(0, len(to_refresh), REFRESH_BATCH_SIZE):
-            batch = to_refresh[i:i + REFRESH_BATCH_SIZE]
-            results = await asyncio.gather(*[_refresh_one(t) for t in batch])
-            refreshed += len(batch)
-            recovered += sum(r["recovered"] for r in results)
-            expired += sum(r["expired"] for r in results)
+                            return {"recovered": False, "expired": True}
+                    elif "429" in error_str and retry < 2:
+                        # 限流：仅当前 token 退避后重试，不阻塞其他 worker
+                        await asyncio.sleep(REFRESH_RATE_LIMIT_BACKOFF)
+                        continue
+                    else:
+                        logger.warning(
+                            f"Token {token_info.token[:10]}...: refresh failed ({e})"
+                        )
+                        token_info.mark_synced()
+                        return {"recovered": False, "expired": False}
             
-            # 批次间延迟
-            if i + REFRESH_BATCH_SIZE < len(to_refresh):
-                await asyncio.sleep(1)
+            token_info.mark_synced()
+            return {"recovered": False, "expired": False}
+        
+        async def _worker():
+            while True:
+                try:
+                    token_info = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                results.append(await _refresh_one(token_info))
+        
+        await asyncio.gather(
+            *(_worker() for _ in range(min(REFRESH_CONCURRENCY, len(to_refresh))))
+        )
+        refreshed = len(results)
+        recovered = sum(r["recovered"] for r in results)
+        expired = sum(r["expired"] for r in results)
         
         await self._save()
         
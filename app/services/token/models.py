@@ -7,10 +7,12 @@ Token 数据模型
 - lowEffort 扣 1，highEffort 扣 4
 """
 
+import time
+from dataclasses import asdict, dataclass, field
 from enum import Enum
-from typing import Optional, List
-from pydantic import BaseModel, Field
-from datetime import datetime
+from typing import Any, Callable, Dict, Optional, List
+
+import orjson
 
 
 # 默认配额
@@ -20,6 +22,15 @@ DEFAULT_QUOTA = 80
 FAIL_THRESHOLD = 5
 
 
+def _now_ms() -> int:
+    """当前时间戳 (毫秒)"""
+    return time.time_ns() // 1_000_000
+
+
+def _opt_int(value: Any) -> Optional[int]:
+    return None if value is None else int(value)
+
+
 class TokenStatus(str, Enum):
     """Token 状态"""
     ACTIVE = "active"
@@ -40,7 +51,16 @@ EFFORT_COST = {
 }
 
 
-class TokenInfo(BaseModel):
+# 配额变化后的状态迁移: (当前状态, 是否有剩余配额) -> 新状态
+# 无配额一律 cooling；有配额时 cooling/expired 恢复为 active，其余保持不变
+_AFTER_QUOTA_CHANGE = {(s, False): TokenStatus.COOLING for s in TokenStatus}
+_AFTER_QUOTA_CHANGE.update({(s, True): s for s in TokenStatus})
+_AFTER_QUOTA_CHANGE[(TokenStatus.COOLING, True)] = TokenStatus.ACTIVE
+_AFTER_QUOTA_CHANGE[(TokenStatus.EXPIRED, True)] = TokenStatus.ACTIVE
+
+
+@dataclass(slots=True)
+class TokenInfo:
     """Token 信息"""
     
     token: str
@@ -48,7 +68,7 @@ class TokenInfo(BaseModel):
     quota: int = DEFAULT_QUOTA
     
     # 统计
-    created_at: int = Field(default_factory=lambda: int(datetime.now().timestamp() * 1000))
+    created_at: int = field(default_factory=_now_ms)
     last_used_at: Optional[int] = None
     use_count: int = 0
     
@@ -61,9 +81,89 @@ class TokenInfo(BaseModel):
     last_sync_at: Optional[int] = None  # 上次同步时间
     
     # 扩展
-    tags: List[str] = Field(default_factory=list)
+    tags: List[str] = field(default_factory=list)
     note: str = ""
     last_asset_clear_at: Optional[int] = None
+
+    # 状态/配额变更回调（由所属 TokenPool 设置，用于维护选择索引）
+    _on_change: Optional[Callable[["TokenInfo"], None]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    # to_dict() 缓存，任何变更后失效
+    _cached_dump: Optional[Dict[str, Any]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    # to_dict() 的 JSON 序列化缓存，任何变更后失效
+    _json_cache: Optional[bytes] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    # 上次同步的单调时钟时间，用于 need_refresh（不受系统时间跳变影响）
+    _last_sync_mono: Optional[float] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self):
+        if self.last_sync_at is not None:
+            # 从持久化的墙钟时间换算到单调时钟
+            elapsed = max(0, _now_ms() - self.last_sync_at) / 1000
+            self._last_sync_mono = time.monotonic() - elapsed
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "TokenInfo":
+        """从存储数据构建（后端可能返回字符串形式的数值）"""
+        return cls(
+            token=d["token"],
+            status=TokenStatus(d.get("status") or TokenStatus.ACTIVE),
+            quota=int(d.get("quota", DEFAULT_QUOTA)),
+            created_at=int(d["created_at"]) if d.get("created_at") is not None else _now_ms(),
+            last_used_at=_opt_int(d.get("last_used_at")),
+            use_count=int(d.get("use_count") or 0),
+            fail_count=int(d.get("fail_count") or 0),
+            last_fail_at=_opt_int(d.get("last_fail_at")),
+            last_fail_reason=d.get("last_fail_reason"),
+            last_sync_at=_opt_int(d.get("last_sync_at")),
+            tags=list(d.get("tags") or []),
+            note=d.get("note") or "",
+            last_asset_clear_at=_opt_int(d.get("last_asset_clear_at")),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """序列化为存储数据"""
+        return {
+            "token": self.token,
+            "status": self.status.value,
+            "quota": self.quota,
+            "created_at": self.created_at,
+            "last_used_at": self.last_used_at,
+            "use_count": self.use_count,
+            "fail_count": self.fail_count,
+            "last_fail_at": self.last_fail_at,
+            "last_fail_reason": self.last_fail_reason,
+            "last_sync_at": self.last_sync_at,
+            "tags": list(self.tags),
+            "note": self.note,
+            "last_asset_clear_at": self.last_asset_clear_at,
+        }
+
+    def _notify(self):
+        self._cached_dump = None
+        self._json_cache = None
+        if self._on_change is not None:
+            self._on_change(self)
+
+    def dump(self) -> Dict[str, Any]:
+        """返回缓存的 to_dict() 结果（只读，勿修改）"""
+        d = self._cached_dump
+        if d is None:
+            d = self._cached_dump = self.to_dict()
+        return d
+
+    def to_json_bytes(self) -> bytes:
+        """返回缓存的 JSON 序列化结果"""
+        b = self._json_cache
+        if b is None:
+            b = self._json_cache = orjson.dumps(self.dump())
+        return b
     
     def is_available(self) -> bool:
         """检查是否可用（状态正常且配额 > 0）"""
@@ -82,7 +182,7 @@ class TokenInfo(BaseModel):
         cost = EFFORT_COST[effort]
         actual_cost = min(cost, self.quota)
         
-        self.last_used_at = int(datetime.now().timestamp() * 1000)
+        self.last_used_at = _now_ms()
         self.use_count += 1
         self.quota = max(0, self.quota - cost)
         
@@ -90,11 +190,9 @@ class TokenInfo(BaseModel):
         self.fail_count = 0
         self.last_fail_reason = None
         
-        if self.quota == 0:
-            self.status = TokenStatus.COOLING
-        elif self.status in [TokenStatus.COOLING, TokenStatus.EXPIRED]:
-            self.status = TokenStatus.ACTIVE
-            
+        self.status = _AFTER_QUOTA_CHANGE[(self.status, self.quota > 0)]
+        
+        self._notify()
         return actual_cost
     
     def update_quota(self, new_quota: int):
@@ -105,11 +203,9 @@ class TokenInfo(BaseModel):
             new_quota: 新的配额值
         """
         self.quota = max(0, new_quota)
+        self.status = _AFTER_QUOTA_CHANGE[(self.status, self.quota > 0)]
         
-        if self.quota == 0:
-            self.status = TokenStatus.COOLING
-        elif self.quota > 0 and self.status in [TokenStatus.COOLING, TokenStatus.EXPIRED]:
-            self.status = TokenStatus.ACTIVE
+        self._notify()
     
     def reset(self):
         """重置配额到默认值"""
@@ -117,19 +213,32 @@ class TokenInfo(BaseModel):
         self.status = TokenStatus.ACTIVE
         self.fail_count = 0
         self.last_fail_reason = None
+        self._notify()
     
-    def record_fail(self, status_code: int = 401, reason: str = ""):
-        """记录失败，达到阈值后自动标记为 expired"""
+    def record_fail(self, status_code: int = 401, reason: str = "") -> bool:
+        """
+        记录失败，达到阈值后自动标记为 expired
+        
+        Returns:
+            是否有字段发生变化（非 401 不计入，返回 False）
+        """
         # 仅 401 错误才计入失败
         if status_code != 401:
-            return
+            return False
         
         self.fail_count += 1
-        self.last_fail_at = int(datetime.now().timestamp() * 1000)
+        self.last_fail_at = _now_ms()
         self.last_fail_reason = reason
         
         if self.fail_count >= FAIL_THRESHOLD:
             self.status = TokenStatus.EXPIRED
+        self._notify()
+        return True
+    
+    def mark_expired(self):
+        """标记为 expired"""
+        self.status = TokenStatus.EXPIRED
+        self._notify()
     
     def record_success(self, is_usage: bool = True):
         """记录成功，清空失败计数并根据配额更新状态"""
@@ -139,31 +248,38 @@ class TokenInfo(BaseModel):
         
         if is_usage:
             self.use_count += 1
-            self.last_used_at = int(datetime.now().timestamp() * 1000)
+            self.last_used_at = _now_ms()
         
         if self.quota == 0:
             self.status = TokenStatus.COOLING
         else:
             self.status = TokenStatus.ACTIVE
+        self._notify()
     
     def need_refresh(self, interval_hours: int = 8) -> bool:
         """检查是否需要刷新配额"""
         if self.status != TokenStatus.COOLING:
             return False
         
-        if self.last_sync_at is None:
+        if self._last_sync_mono is None:
             return True
         
-        now = int(datetime.now().timestamp() * 1000)
-        interval_ms = interval_hours * 3600 * 1000
-        return (now - self.last_sync_at) >= interval_ms
+        return (time.monotonic() - self._last_sync_mono) >= interval_hours * 3600
     
     def mark_synced(self):
         """标记已同步"""
-        self.last_sync_at = int(datetime.now().timestamp() * 1000)
+        self.last_sync_at = _now_ms()
+        self._last_sync_mono = time.monotonic()
+        self._notify()
+
+    def mark_asset_clear(self):
+        """记录在线资产清理时间"""
+        self.last_asset_clear_at = _now_ms()
+        self._notify()
 
 
-class TokenPoolStats(BaseModel):
+@dataclass(slots=True)
+class TokenPoolStats:
     """Token 池统计"""
     total: int = 0
     active: int = 0
@@ -173,6 +289,9 @@ class TokenPoolStats(BaseModel):
     total_quota: int = 0
     avg_quota: float = 0.0
 
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
 
 __all__ = [
     "TokenStatus",
@@ -1,7 +1,8 @@
 """Token 池管理"""
 
 import random
-from typing import Dict, List, Optional, Iterator
+from collections import Counter
+from typing import Dict, List, Optional, Iterator, Tuple
 
 from app.services.token.models import TokenInfo, TokenStatus, TokenPoolStats
 
@@ -12,17 +13,29 @@ class TokenPool:
     def __init__(self, name: str):
         self.name = name
         self._tokens: Dict[str, TokenInfo] = {}
+        # 可用 Token (active 且有配额) 列表，以及 token -> 下标
+        self._active: List[TokenInfo] = []
+        self._active_pos: Dict[str, int] = {}
+        # 实时统计: 各状态数量与总配额，token -> 计入统计时的 (status, quota)
+        self._status_count: Counter = Counter()
+        self._total_quota = 0
+        self._counted: Dict[str, Tuple[TokenStatus, int]] = {}
     
     def add(self, token: TokenInfo):
         """添加 Token"""
+        self._unindex(token.token)
         self._tokens[token.token] = token
+        token._on_change = self._on_token_change
+        self._index(token)
     
     def remove(self, token_str: str) -> bool:
         """删除 Token"""
-        if token_str in self._tokens:
-            del self._tokens[token_str]
-            return True
-        return False
+        token = self._tokens.pop(token_str, None)
+        if token is None:
+            return False
+        self._unindex(token_str)
+        token._on_change = None
+        return True
         
     def get(self, token_str: str) -> Optional[TokenInfo]:
         """获取 Token"""
@@ -31,28 +44,20 @@ class TokenPool:
     def select(self) -> Optional[TokenInfo]:
         """
         选择一个可用 Token
-        策略: 
-        1. 选择 active 状态且有配额的 token
-        2. 优先选择剩余额度最多的
-        3. 如果额度相同，随机选择（避免并发冲突）
+        策略 (power of two choices): 
+        1. 从 active 状态且有配额的 token 中随机抽取两个
+        2. 返回剩余额度更多的一个（相同则取第一个）
         """
-        # 选择 token
-        available = [
-            t for t in self._tokens.values() 
-            if t.status == TokenStatus.ACTIVE and t.quota > 0
-        ]
-        
-        if not available:
+        active = self._active
+        n = len(active)
+        if n == 0:
             return None
+        if n == 1:
+            return active[0]
             
-        # 找到最大额度
-        max_quota = max(t.quota for t in available)
-        
-        # 筛选最大额度
-        candidates = [t for t in available if t.quota == max_quota]
-        
-        # 随机选择
-        return random.choice(candidates)
+        a = active[random.randrange(n)]
+        b = active[random.randrange(n)]
+        return a if a.quota >= b.quota else b
         
     def count(self) -> int:
         """Token 数量"""
@@ -64,28 +69,57 @@ class TokenPool:
     
     def get_stats(self) -> TokenPoolStats:
         """获取池统计信息"""
-        stats = TokenPoolStats(total=len(self._tokens))
-        
-        for token in self._tokens.values():
-            stats.total_quota += token.quota
-            
-            if token.status == TokenStatus.ACTIVE:
-                stats.active += 1
-            elif token.status == TokenStatus.DISABLED:
-                stats.disabled += 1
-            elif token.status == TokenStatus.EXPIRED:
-                stats.expired += 1
-            elif token.status == TokenStatus.COOLING:
-                stats.cooling += 1
-        
-        if stats.total > 0:
-            stats.avg_quota = stats.total_quota / stats.total
-            
-        return stats
+        total = len(self._tokens)
+        return TokenPoolStats(
+            total=total,
+            active=self._status_count[TokenStatus.ACTIVE],
+            disabled=self._status_count[TokenStatus.DISABLED],
+            expired=self._status_count[TokenStatus.EXPIRED],
+            cooling=self._status_count[TokenStatus.COOLING],
+            total_quota=self._total_quota,
+            avg_quota=self._total_quota / total if total else 0.0,
+        )
         
+    def _index(self, token: TokenInfo):
+        self._counted[token.token] = (token.status, token.quota)
+        self._status_count[token.status] += 1
+        self._total_quota += token.quota
+        if token.status != TokenStatus.ACTIVE or token.quota <= 0:
+            return
+        self._active_pos[token.token] = len(self._active)
+        self._active.append(token)
+
+    def _unindex(self, token_str: str):
+        counted = self._counted.pop(token_str, None)
+        if counted is not None:
+            status, quota = counted
+            self._status_count[status] -= 1
+            self._total_quota -= quota
+        i = self._active_pos.pop(token_str, None)
+        if i is None:
+            return
+        last = self._active.pop()
+        if i < len(self._active):
+            # 用末尾元素填补空位，O(1) 删除
+            self._active[i] = last
+            self._active_pos[last.token] = i
+
+    def _on_token_change(self, token: TokenInfo):
+        """Token 状态或配额变化后更新可用列表与统计"""
+        if self._tokens.get(token.token) is not token:
+            return
+        self._unindex(token.token)
+        self._index(token)
+
     def _rebuild_index(self):
-        """重建索引（预留接口，用于加载时调用）"""
-        pass
+        """重建可用 Token 索引与统计（加载时调用）"""
+        self._active = []
+        self._active_pos = {}
+        self._status_count = Counter()
+        self._total_quota = 0
+        self._counted = {}
+        for token in self._tokens.values():
+            self._index(token)
         
     def __iter__(self) -> Iterator[TokenInfo]:
         return iter(self._tokens.values())
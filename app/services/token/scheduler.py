@@ -1,11 +1,18 @@
 """Token 刷新调度器"""
 
 import asyncio
+import random
 from typing import Optional
 
 from app.core.logger import logger
 from app.core.storage import get_storage, StorageError, RedisStorage
 from app.services.token.manager import get_token_manager
+from app.services.token.models import _now_ms
+
+# 多 worker 共享的下次刷新时间戳 (毫秒)
+NEXT_REFRESH_KEY = "grok2api:next_refresh"
+# 唤醒时间随机抖动上限 (秒)，错开各 worker 的抢锁时机
+WAKEUP_JITTER_SECONDS = 15
 
 
 class TokenRefreshScheduler:
@@ -16,6 +23,41 @@ class TokenRefreshScheduler:
         self.interval_seconds = interval_hours * 3600
         self._task: Optional[asyncio.Task] = None
         self._running = False
+
+    def _key_ttl(self) -> int:
+        """下次刷新时间 key 的过期秒数 (Redis 要求整数；间隔小时数可以是小数)"""
+        return max(1, int(self.interval_seconds * 2))
+
+    async def _seconds_until_next_run(self, storage) -> float:
+        """距离下次刷新的秒数：Redis 下按共享的绝对时间戳计算，其余后端使用固定间隔"""
+        if not isinstance(storage, RedisStorage):
+            return self.interval_seconds
+        try:
+            now = _now_ms()
+            await storage.redis.set(
+                NEXT_REFRESH_KEY,
+                int(now + self.interval_seconds * 1000),
+                nx=True,
+                ex=self._key_ttl(),
+            )
+            # 兼容旧版本写入的浮点时间戳
+            next_ts = int(float(await storage.redis.get(NEXT_REFRESH_KEY) or 0))
+            remaining = max(0, next_ts - now) / 1000
+            return remaining + random.uniform(0, WAKEUP_JITTER_SECONDS)
+        except Exception as e:
+            logger.warning(f"Scheduler: failed to read next refresh time - {e}")
+            return self.interval_seconds
+
+    async def _claim_next_run(self, storage):
+        """抢到锁后立即推进下次刷新时间，其他 worker 据此休眠而不是反复抢锁"""
+        try:
+            await storage.redis.set(
+                NEXT_REFRESH_KEY,
+                int(_now_ms() + self.interval_seconds * 1000),
+                ex=self._key_ttl(),
+            )
+        except Exception as e:
+            logger.warning(f"Scheduler: failed to update next refresh time - {e}")
     
     async def _refresh_loop(self):
         """刷新循环"""
@@ -23,8 +65,8 @@ class TokenRefreshScheduler:
         
         while self._running:
             try:
-                await asyncio.sleep(self.interval_seconds)
                 storage = get_storage()
+                await asyncio.sleep(await self._seconds_until_next_run(storage))
                 lock_acquired = False
                 lock = None
 
@@ -45,6 +87,8 @@ class TokenRefreshScheduler:
                     continue
 
                 try:
+                    if lock is not None:
+                        await self._claim_next_run(storage)
                     logger.info("Scheduler: starting token refresh...")
                     manager = await get_token_manager()
                     result = await manager.refresh_cooling_tokens()
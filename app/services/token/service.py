@@ -1,11 +1,45 @@
 """Token 服务外观（Facade）"""
 
-from typing import List, Optional, Dict
+import time
+from typing import Any, Callable, List, Optional, Dict, Tuple
 
-from app.services.token.manager import get_token_manager
+from app.services.token.manager import TokenManager, get_token_manager
 from app.services.token.models import TokenInfo, EffortType
 
 
+# 已初始化的 TokenManager 单例，预热后各方法无需再 await get_token_manager()
+_manager: Optional[TokenManager] = None
+
+
+async def _resolve() -> TokenManager:
+    global _manager
+    if _manager is None:
+        _manager = await get_token_manager()
+    return _manager
+
+
+# 统计/列表快照缓存: key -> (过期时间, 版本, 结果)；写操作递增版本使其失效
+# (写操作前后各递增一次：等待写入期间构建的快照会记在中间版本下)
+_SNAPSHOT_TTL = 1.0
+_snapshot_version = 0
+_snapshots: Dict[Tuple[str, str], Tuple[float, int, Any]] = {}
+
+
+def _invalidate_snapshots():
+    global _snapshot_version
+    _snapshot_version += 1
+
+
+def _snapshot(key: Tuple[str, str], build: Callable[[], Any]) -> Any:
+    now = time.monotonic()
+    hit = _snapshots.get(key)
+    if hit is not None and hit[0] > now and hit[1] == _snapshot_version:
+        return hit[2]
+    value = build()
+    _snapshots[key] = (now + _SNAPSHOT_TTL, _snapshot_version, value)
+    return value
+
+
 class TokenService:
     """
     Token 服务外观
@@ -24,7 +58,7 @@ class TokenService:
         Returns:
             Token 字符串（不含 sso= 前缀）或 None
         """
-        manager = await get_token_manager()
+        manager = _manager or await _resolve()
         return manager.get_token(pool_name)
     
     @staticmethod
@@ -39,7 +73,7 @@ class TokenService:
         Returns:
             是否成功
         """
-        manager = await get_token_manager()
+        manager = _manager or await _resolve()
         return await manager.consume(token, effort)
     
     @staticmethod
@@ -59,7 +93,7 @@ class TokenService:
         Returns:
             是否成功
         """
-        manager = await get_token_manager()
+        manager = _manager or await _resolve()
         return await manager.sync_usage(token, model, effort)
     
     @staticmethod
@@ -75,8 +109,12 @@ class TokenService:
         Returns:
             是否成功
         """
-        manager = await get_token_manager()
-        return await manager.record_fail(token, status_code, reason)
+        manager = _manager or await _resolve()
+        _invalidate_snapshots()
+        try:
+            return await manager.record_fail(token, status_code, reason)
+        finally:
+            _invalidate_snapshots()
     
     @staticmethod
     async def add_token(token: str, pool_name: str = "ssoBasic") -> bool:
@@ -90,8 +128,12 @@ class TokenService:
         Returns:
             是否成功
         """
-        manager = await get_token_manager()
-        return await manager.add(token, pool_name)
+        manager = _manager or await _resolve()
+        _invalidate_snapshots()
+        try:
+            return await manager.add(token, pool_name)
+        finally:
+            _invalidate_snapshots()
     
     @staticmethod
     async def remove_token(token: str) -> bool:
@@ -104,8 +146,12 @@ class TokenService:
         Returns:
             是否成功
         """
-        manager = await get_token_manager()
-        return await manager.remove(token)
+        manager = _manager or await _resolve()
+        _invalidate_snapshots()
+        try:
+            return await manager.remove(token)
+        finally:
+            _invalidate_snapshots()
     
     @staticmethod
     async def reset_token(token: str) -> bool:
@@ -118,30 +164,38 @@ class TokenService:
         Returns:
             是否成功
         """
-        manager = await get_token_manager()
-        return await manager.reset_token(token)
+        manager = _manager or await _resolve()
+        _invalidate_snapshots()
+        try:
+            return await manager.reset_token(token)
+        finally:
+            _invalidate_snapshots()
     
     @staticmethod
     async def reset_all():
         """重置所有 Token"""
-        manager = await get_token_manager()
-        await manager.reset_all()
+        manager = _manager or await _resolve()
+        _invalidate_snapshots()
+        try:
+            await manager.reset_all()
+        finally:
+            _invalidate_snapshots()
     
     @staticmethod
     async def get_stats() -> Dict[str, dict]:
         """
-        获取统计信息
+        获取统计信息（1 秒内的重复调用返回同一快照）
         
         Returns:
             各池的统计信息
         """
-        manager = await get_token_manager()
-        return manager.get_stats()
+        manager = _manager or await _resolve()
+        return _snapshot(("stats", ""), manager.get_stats)
     
     @staticmethod
     async def list_tokens(pool_name: str = "ssoBasic") -> List[TokenInfo]:
         """
-        获取指定池的所有 Token
+        获取指定池的所有 Token（1 秒内的重复调用复用同一快照，每次返回新列表）
         
         Args:
             pool_name: Token 池名称
@@ -149,8 +203,8 @@ class TokenService:
         Returns:
             Token 列表
         """
-        manager = await get_token_manager()
-        return manager.get_pool_tokens(pool_name)
+        manager = _manager or await _resolve()
+        return list(_snapshot(("tokens", pool_name), lambda: tuple(manager.get_pool_tokens(pool_name))))
 
 
 __all__ = ["TokenService"]
@@ -4,18 +4,24 @@ Grok2API 应用入口
 FastAPI 应用初始化和路由注册
 """
 
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
+from functools import lru_cache
 import asyncio
 import os
 import platform
 import sys
+import time
 from pathlib import Path
+from typing import Optional
 
 from dotenv import load_dotenv
 
+# reload / 多 worker 重复导入时跳过 .env 解析（环境变量已由首次加载继承）
 env_file = Path(__file__).parent / ".env"
-if env_file.exists():
-    load_dotenv(env_file)
+if not os.getenv("GROK2API_ENV_LOADED"):
+    if env_file.exists():
+        load_dotenv(env_file)
+    os.environ["GROK2API_ENV_LOADED"] = "1"
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
@@ -33,18 +39,47 @@ from app.api.v1.models import router as models_router
 from app.services.token import get_scheduler
 
 
-# 初始化日志
-setup_logging(
-    level=os.getenv("LOG_LEVEL", "INFO"),
-    json_console=False,
-    file_logging=True,
-)
+# 静态文件 content-type 修正表（见 create_app 中的 _UTF8StaticFiles）
+_UTF8_BASES = frozenset({"application/javascript", "text/javascript", "application/json", "text/css"})
+_EXT_CTYPE = {
+    ".js": "application/javascript; charset=utf-8",
+    ".mjs": "application/javascript; charset=utf-8",
+    ".css": "text/css; charset=utf-8",
+    ".html": "text/html; charset=utf-8",
+    ".htm": "text/html; charset=utf-8",
+}
+
+
+@lru_cache(maxsize=64)
+def _utf8_content_type(ctype: str) -> Optional[str]:
+    """返回补充 charset 后的 content-type；无需修改时返回 None"""
+    base = ctype.split(";", 1)[0].strip().lower()
+    if base.startswith("text/") or base in _UTF8_BASES:
+        return f"{base}; charset=utf-8"
+    return None
+
+
+@lru_cache(maxsize=512)
+def _content_type_by_ext(path: str) -> Optional[str]:
+    return _EXT_CTYPE.get(Path(path).suffix.lower())
+
+
+# 静态文件内存缓存：同一路径每秒最多 stat 一次，超过该大小的文件不缓存
+_STATIC_RECHECK_SECONDS = 1.0
+_STATIC_CACHE_MAX_BYTES = 512 * 1024
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
 
+    # 初始化日志（放在 lifespan 中，避免导入 main 时构建日志 handler）
+    setup_logging(
+        level=os.getenv("LOG_LEVEL", "INFO"),
+        json_console=False,
+        file_logging=True,
+    )
+
     # 0. 兼容迁移：保留旧版 data 目录中的配置/缓存等数据
     from app.core.legacy_migration import migrate_legacy_cache_dirs, migrate_legacy_account_settings
 
@@ -55,14 +90,26 @@ async def lifespan(app: FastAPI):
 
     await config.load()
 
+    # 持有存储实例的引用，关闭时直接使用
+    from app.core.storage import get_storage
+
+    app.state.storage = get_storage()
+
     # 1.1 Old account post-migration settings (TOS + NSFW), best-effort
     async def _run_legacy_account_migration():
         try:
-            await migrate_legacy_account_settings(concurrency=10)
+            await migrate_legacy_account_settings(concurrency=10, ready=app.state.ready)
         except Exception as e:
             logger.warning(f"Legacy account migration failed: {e}")
 
-    asyncio.create_task(_run_legacy_account_migration())
+    # 首个请求完成（或超时）后才开始批量迁移，避免与启动流量争抢
+    app.state.ready = asyncio.Event()
+    app.state._migration_task = asyncio.create_task(_run_legacy_account_migration())
+
+    # 1.2 预热 Token 管理器，请求路径上不再触发首次加载
+    from app.services.token import get_token_manager
+
+    await get_token_manager()
 
     # 2. 启动服务显示
     logger.info("Starting Grok2API...")
@@ -90,10 +137,13 @@ async def lifespan(app: FastAPI):
     except Exception:
         pass
 
-    from app.core.storage import StorageFactory
+    migration_task = app.state._migration_task
+    if not migration_task.done():
+        migration_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await migration_task
 
-    if StorageFactory._instance:
-        await StorageFactory._instance.close()
+    await app.state.storage.close()
 
     if refresh_enabled:
         scheduler = get_scheduler()
@@ -102,9 +152,12 @@ async def lifespan(app: FastAPI):
 
 def create_app() -> FastAPI:
     """创建 FastAPI 应用"""
+    from fastapi.responses import ORJSONResponse
+
     app = FastAPI(
         title="Grok2API",
         lifespan=lifespan,
+        default_response_class=ORJSONResponse,
     )
 
     # CORS 配置
@@ -134,42 +187,106 @@ def create_app() -> FastAPI:
     # Some browsers/OS locales may then mis-decode UTF-8 and display `????` for Chinese text.
     # Force `charset=utf-8` for JS to avoid mojibake across environments (local/docker).
     from fastapi.staticfiles import StaticFiles
+    from starlette.datastructures import Headers
+    from starlette.responses import FileResponse, Response
+    from starlette.routing import Match, Mount
+    from starlette.staticfiles import NotModifiedResponse
 
     static_dir = Path(__file__).parent / "app" / "static"
     if static_dir.exists():
         class _UTF8StaticFiles(StaticFiles):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                # path -> [上次 stat 时间, 文件路径, mtime, size, body, headers]
+                self._file_cache: dict = {}
+
+            def _cached_response(self, path: str, scope):
+                entry = self._file_cache.get(path)
+                if entry is None:
+                    return None
+                request_headers = Headers(scope=scope)
+                # Range 请求交给 FileResponse 处理 (206)，缓存只提供完整内容
+                if "range" in request_headers:
+                    return None
+                now = time.monotonic()
+                if now - entry[0] >= _STATIC_RECHECK_SECONDS:
+                    try:
+                        st = os.stat(entry[1])
+                    except OSError:
+                        self._file_cache.pop(path, None)
+                        return None
+                    if (st.st_mtime, st.st_size) != (entry[2], entry[3]):
+                        self._file_cache.pop(path, None)
+                        return None
+                    entry[0] = now
+                headers = entry[5]
+                etag = headers.get("etag")
+                if etag and etag in request_headers.get("if-none-match", ""):
+                    return NotModifiedResponse(headers)
+                return Response(content=entry[4], headers=headers)
+
             async def get_response(self, path: str, scope):  # type: ignore[override]
+                cached = self._cached_response(path, scope)
+                if cached is not None:
+                    return cached
+
                 resp = await super().get_response(path, scope)
+                self._fix_content_type(path, resp)
+                # 静态资源不经过 CORSMiddleware，固定放开跨域
+                resp.headers["access-control-allow-origin"] = "*"
+                if (
+                    isinstance(resp, FileResponse)
+                    and resp.status_code == 200
+                    and resp.stat_result is not None
+                    and resp.stat_result.st_size <= _STATIC_CACHE_MAX_BYTES
+                ):
+                    try:
+                        body = await asyncio.to_thread(Path(resp.path).read_bytes)
+                        headers = {k: v for k, v in resp.headers.items() if k != "content-length"}
+                        st = resp.stat_result
+                        self._file_cache[path] = [
+                            time.monotonic(), resp.path, st.st_mtime, st.st_size, body, headers,
+                        ]
+                    except OSError:
+                        pass
+                return resp
 
+            @staticmethod
+            def _fix_content_type(path: str, resp) -> None:
                 # Starlette uses `mimetypes` which may vary across OS/distros.
                 # Ensure UTF-8 decoding for text-like assets to avoid mojibake (`????`) on some locales.
-                ctype = (resp.headers.get("content-type", "") or "").strip()
-                ctype_l = ctype.lower()
-                if "charset=" in ctype_l:
-                    return resp
-
-                base = ctype.split(";", 1)[0].strip().lower()
-                is_text = base.startswith("text/")
-                is_js = base in ("application/javascript", "text/javascript")
-                is_json = base == "application/json"
-                is_css = base == "text/css"
+                ctype = resp.headers.get("content-type", "")
+                if "charset=" in ctype.lower():
+                    return
 
                 # Some servers might respond with empty content-type for 304 etc; fall back by extension.
-                if not base:
-                    ext = Path(path).suffix.lower()
-                    if ext in (".js", ".mjs"):
-                        resp.headers["content-type"] = "application/javascript; charset=utf-8"
-                    elif ext == ".css":
-                        resp.headers["content-type"] = "text/css; charset=utf-8"
-                    elif ext in (".html", ".htm"):
-                        resp.headers["content-type"] = "text/html; charset=utf-8"
-                    return resp
-
-                if is_text or is_js or is_json or is_css:
-                    resp.headers["content-type"] = f"{base}; charset=utf-8"
-                return resp
-
-        app.mount("/static", _UTF8StaticFiles(directory=static_dir), name="static")
+                if not ctype.strip():
+                    fixed = _content_type_by_ext(path)
+                else:
+                    fixed = _utf8_content_type(ctype)
+                if fixed:
+                    resp.headers["content-type"] = fixed
+
+        class _StaticFastPath:
+            """/static 请求直接交给静态文件挂载点，跳过 CORS 与请求日志中间件"""
+
+            def __init__(self, app, route: Mount):
+                self.app = app
+                self.route = route
+
+            async def __call__(self, scope, receive, send):
+                if scope["type"] == "http" and scope["path"].startswith("/static/"):
+                    match, child_scope = self.route.matches(scope)
+                    if match == Match.FULL:
+                        scope.update(child_scope)
+                        await self.route.handle(scope, receive, send)
+                        return
+                await self.app(scope, receive, send)
+
+        static_route = Mount("/static", app=_UTF8StaticFiles(directory=static_dir), name="static")
+        app.router.routes.append(static_route)
+        # 最后添加 = 最外层用户中间件，位于 CORS/日志中间件之前
+        app.add_middleware(_StaticFastPath, route=static_route)
 
     # 注册管理路由
     from app.api.v1.admin import router as admin_router
@@ -200,10 +317,18 @@ if __name__ == "__main__":
         )
         workers = 1
 
+    # 非 Windows 且已安装 speedups 可选依赖时使用 uvloop + httptools
+    from importlib.util import find_spec
+
+    server_opts = {}
+    if not is_windows and find_spec("uvloop") and find_spec("httptools"):
+        server_opts = {"loop": "uvloop", "http": "httptools"}
+
     uvicorn.run(
         "main:app",
         host=host,
         port=port,
         workers=workers,
         log_level=os.getenv("LOG_LEVEL", "INFO").lower(),
+        **server_opts,
     )
@@ -1,13 +1,19 @@
 import os
 import sys
 import time
-import uuid
+import secrets
 import random
 import logging
 import asyncio
 from typing import Optional, Union
 import argparse
-from quart import Quart, request, jsonify
+import orjson
+from contextlib import suppress
+from functools import cached_property
+from pathlib import Path
+from urllib.parse import urlsplit
+from quart import Quart, Response, request, jsonify
+from quart.json.provider import DefaultJSONProvider
 try:
     from camoufox.async_api import AsyncCamoufox
 except Exception:  # pragma: no cover
@@ -17,13 +23,8 @@ try:
     from patchright.async_api import async_playwright
 except Exception:  # pragma: no cover
     from playwright.async_api import async_playwright
-from db_results import init_db, save_result, load_result, cleanup_old_results
+from db_results import init_db, save_result, load_result, wait_result, cleanup_old_results
 from browser_configs import browser_config
-from rich.console import Console
-from rich.panel import Panel
-from rich.text import Text
-from rich.align import Align
-from rich import box
 
 
 
@@ -38,25 +39,41 @@ COLORS = {
 
 
 class CustomLogger(logging.Logger):
-    @staticmethod
-    def format_message(level, color, message):
-        timestamp = time.strftime('%H:%M:%S')
-        return f"[{timestamp}] [{COLORS.get(color)}{level}{COLORS.get('RESET')}] -> {message}"
+    # (epoch second, formatted "%H:%M:%S") — strftime runs at most once per second.
+    _ts_cache = (0, "")
+
+    @classmethod
+    def _timestamp(cls) -> str:
+        now = int(time.time())
+        cached_at, text = cls._ts_cache
+        if now != cached_at:
+            text = time.strftime('%H:%M:%S', time.localtime(now))
+            cls._ts_cache = (now, text)
+        return text
+
+    @classmethod
+    def format_message(cls, level, color, message):
+        return f"[{cls._timestamp()}] [{COLORS.get(color)}{level}{COLORS.get('RESET')}] -> {message}"
 
     def debug(self, message, *args, **kwargs):
-        super().debug(self.format_message('DEBUG', 'MAGENTA', message), *args, **kwargs)
+        if self.isEnabledFor(logging.DEBUG):
+            super().debug(self.format_message('DEBUG', 'MAGENTA', message), *args, **kwargs)
 
     def info(self, message, *args, **kwargs):
-        super().info(self.format_message('INFO', 'BLUE', message), *args, **kwargs)
+        if self.isEnabledFor(logging.INFO):
+            super().info(self.format_message('INFO', 'BLUE', message), *args, **kwargs)
 
     def success(self, message, *args, **kwargs):
-        super().info(self.format_message('SUCCESS', 'GREEN', message), *args, **kwargs)
+        if self.isEnabledFor(logging.INFO):
+            super().info(self.format_message('SUCCESS', 'GREEN', message), *args, **kwargs)
 
     def warning(self, message, *args, **kwargs):
-        super().warning(self.format_message('WARNING', 'YELLOW', message), *args, **kwargs)
+        if self.isEnabledFor(logging.WARNING):
+            super().warning(self.format_message('WARNING', 'YELLOW', message), *args, **kwargs)
 
     def error(self, message, *args, **kwargs):
-        super().error(self.format_message('ERROR', 'RED', message), *args, **kwargs)
+        if self.isEnabledFor(logging.ERROR):
+            super().error(self.format_message('ERROR', 'RED', message), *args, **kwargs)
 
 
 logging.setLoggerClass(CustomLogger)
@@ -65,21 +82,343 @@ logger.setLevel(logging.DEBUG)
 handler = logging.StreamHandler(sys.stdout)
 logger.addHandler(handler)
 
+# Counts matches for each selector in one round-trip, including open shadow roots
+# (matching what page.locator(...).count() would report).
+COUNT_SELECTORS_JS = """
+(selectors) => {
+    const roots = [document];
+    for (let i = 0; i < roots.length; i++) {
+        const walker = document.createTreeWalker(roots[i], NodeFilter.SHOW_ELEMENT);
+        for (let node = walker.nextNode(); node; node = walker.nextNode()) {
+            if (node.shadowRoot) roots.push(node.shadowRoot);
+        }
+    }
+    return selectors.map((selector) => {
+        let count = 0;
+        for (const root of roots) {
+            try { count += root.querySelectorAll(selector).length; } catch (e) {}
+        }
+        return count;
+    });
+}
+"""
+
+# Init script for every solve page: records closed shadow roots (anti-shadow) and hides
+# the usual automation markers.
+PAGE_INIT_JS = """
+(function() {
+    const originalAttachShadow = Element.prototype.attachShadow;
+    Element.prototype.attachShadow = function(init) {
+        const shadow = originalAttachShadow.call(this, init);
+        if (init.mode === 'closed') {
+            window.__lastClosedShadowRoot = shadow;
+        }
+        return shadow;
+    };
+})();
+
+Object.defineProperty(navigator, 'webdriver', {
+    get: () => undefined,
+});
+
+window.chrome = {
+    runtime: {},
+    loadTimes: function() {},
+    csi: function() {},
+};
+"""
+
+# Injects a Turnstile widget into the current page. Parameters are passed as
+# evaluate() arguments, so the source is constant and values are never spliced into JS.
+INJECT_CAPTCHA_JS = """
+([sitekey, action, cdata]) => {
+    // Remove any existing turnstile widgets first
+    document.querySelectorAll('.cf-turnstile').forEach(el => el.remove());
+    document.querySelectorAll('[data-sitekey]').forEach(el => el.remove());
+
+    // Create turnstile widget directly on the page
+    const captchaDiv = document.createElement('div');
+    captchaDiv.className = 'cf-turnstile';
+    captchaDiv.setAttribute('data-sitekey', sitekey);
+    captchaDiv.setAttribute('data-callback', 'onTurnstileCallback');
+    if (action) captchaDiv.setAttribute('data-action', action);
+    if (cdata) captchaDiv.setAttribute('data-cdata', cdata);
+    captchaDiv.style.position = 'fixed';
+    captchaDiv.style.top = '20px';
+    captchaDiv.style.left = '20px';
+    captchaDiv.style.zIndex = '9999';
+    captchaDiv.style.backgroundColor = 'white';
+    captchaDiv.style.padding = '15px';
+    captchaDiv.style.border = '2px solid #0f79af';
+    captchaDiv.style.borderRadius = '8px';
+    captchaDiv.style.boxShadow = '0 4px 12px rgba(0, 0, 0, 0.3)';
+
+    // Add to body immediately
+    document.body.appendChild(captchaDiv);
+
+    const renderOptions = {
+        sitekey: sitekey,
+        callback: function(token) {
+            console.log('Turnstile solved with token:', token);
+            // Create hidden input for token
+            let tokenInput = document.querySelector('input[name="cf-turnstile-response"]');
+            if (!tokenInput) {
+                tokenInput = document.createElement('input');
+                tokenInput.type = 'hidden';
+                tokenInput.name = 'cf-turnstile-response';
+                document.body.appendChild(tokenInput);
+            }
+            tokenInput.value = token;
+        },
+        'error-callback': function(error) {
+            console.log('Turnstile error:', error);
+        }
+    };
+    if (action) renderOptions.action = action;
+    if (cdata) renderOptions.cdata = cdata;
+
+    // Load Turnstile script and render widget
+    const loadTurnstile = () => {
+        const script = document.createElement('script');
+        script.src = 'https://challenges.cloudflare.com/turnstile/v0/api.js';
+        script.async = true;
+        script.defer = true;
+        script.onload = function() {
+            console.log('Turnstile script loaded');
+            // Wait a bit for script to initialize
+            setTimeout(() => {
+                if (window.turnstile && window.turnstile.render) {
+                    try {
+                        window.turnstile.render(captchaDiv, renderOptions);
+                    } catch (e) {
+                        console.log('Turnstile render error:', e);
+                    }
+                } else {
+                    console.log('Turnstile API not available');
+                }
+            }, 1000);
+        };
+        script.onerror = function() {
+            console.log('Failed to load Turnstile script');
+        };
+        document.head.appendChild(script);
+    };
+
+    // Check if Turnstile is already loaded
+    if (window.turnstile) {
+        console.log('Turnstile already loaded, rendering immediately');
+        try {
+            window.turnstile.render(captchaDiv, renderOptions);
+        } catch (e) {
+            console.log('Immediate render error:', e);
+            loadTurnstile();
+        }
+    } else {
+        loadTurnstile();
+    }
+
+    // Setup global callback
+    window.onTurnstileCallback = function(token) {
+        console.log('Global turnstile callback executed:', token);
+    };
+}
+"""
+
+# Context init script: PAGE_INIT_JS plus the injector above, installed once per context as a
+# non-enumerable window property. Each solve then sends only its parameters (INJECT_CAPTCHA_CALL_JS).
+CONTEXT_INIT_JS = (
+    PAGE_INIT_JS
+    + "\nObject.defineProperty(window, '__injectTurnstile', {value: "
+    + INJECT_CAPTCHA_JS.strip()
+    + ", enumerable: false});\n"
+)
+INJECT_CAPTCHA_CALL_JS = "params => window.__injectTurnstile(params)"
+
+# The shared browser is relaunched after this many solves or this many seconds,
+# to bound native memory growth in long-running Chromium processes.
+BROWSER_POOL_RECYCLE_AFTER = int(os.getenv("BROWSER_POOL_RECYCLE_AFTER", "100"))
+BROWSER_POOL_MAX_AGE = float(os.getenv("BROWSER_POOL_MAX_AGE", "3600"))
+
+# Chromium flags that trim helper processes and background work. --renderer-process-limit
+# is deliberately absent: all pool slots share one browser and need parallel renderers.
+CHROMIUM_LEAN_ARGS = [
+    "--disable-dev-shm-usage",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-features=TranslateUI",
+]
+# GPU is unavailable in headless mode anyway; headed runs keep it for a realistic WebGL fingerprint.
+CHROMIUM_HEADLESS_ARGS = ["--disable-gpu"]
+# Sandbox-less mode (e.g. running as root in containers); --no-zygote requires --no-sandbox.
+CHROMIUM_NO_SANDBOX = os.getenv("CHROMIUM_NO_SANDBOX", "").lower() in ("1", "true", "yes")
+CHROMIUM_NO_SANDBOX_ARGS = ["--no-sandbox", "--no-zygote"]
+
+# Resource filter used while the target page loads (see _optimized_route_handler).
+# Hosts are matched exactly (plus any *.cloudflare.com subdomain), not as URL substrings.
+ROUTE_ALLOWED_TYPES = frozenset({'document', 'script', 'xhr', 'fetch'})
+ROUTE_ALLOWED_HOSTS = frozenset({'challenges.cloudflare.com', 'static.cloudflareinsights.com', 'cloudflare.com'})
+ROUTE_ALLOWED_HOST_SUFFIX = '.cloudflare.com'
+# Chromium: the same filter via CDP Fetch while the page loads. Only the resource types
+# outside ROUTE_ALLOWED_TYPES are intercepted (documents, scripts, XHR/fetch are never
+# paused); intercepted requests to the allowed hosts continue, the rest are failed.
+CDP_FETCH_PATTERNS = [
+    {'urlPattern': '*', 'resourceType': resource_type, 'requestStage': 'Request'}
+    for resource_type in (
+        'Image', 'Stylesheet', 'Font', 'Media', 'TextTrack', 'Manifest', 'Ping', 'EventSource', 'Other',
+    )
+]
+
+# Origins cleared before a slot context is reused, in addition to the solved page's own.
+CONTEXT_RESET_ORIGINS = ('https://challenges.cloudflare.com',)
+
+# Token wait in _solve_turnstile: in-page polling interval (ms) within a wall-clock budget,
+# with click attempts spaced by time (seconds).
+SOLVE_POLL_BUDGET = 45.0
+SOLVE_POLL_INTERVAL_MS = 100
+SOLVE_CLICK_INTERVAL = 1.5
+
+# Returns the first non-empty Turnstile response value, or null while unsolved.
+TOKEN_VALUE_JS = """
+() => {
+    for (const input of document.querySelectorAll('input[name="cf-turnstile-response"]')) {
+        if (input.value) return input.value;
+    }
+    return null;
+}
+"""
+
+# Minimum interval between proxies.txt mtime checks (seconds).
+PROXY_RECHECK_SECONDS = 1.0
+
+# Upper bound for the /result?wait=<seconds> long-poll.
+RESULT_WAIT_MAX = 30.0
+
+# Admitted solves per pool slot (running + waiting for a slot); beyond that /turnstile
+# rejects new tasks with ERROR_NO_SLOT_AVAILABLE instead of queueing them without bound.
+SOLVE_QUEUE_PER_SLOT = int(os.getenv("SOLVE_QUEUE_PER_SLOT", "2"))
+
+# Fixed /turnstile and /result replies, serialized once at import (see _static_json).
+_ERR_WRONG_PAGEURL = orjson.dumps({
+    "errorId": 1,
+    "errorCode": "ERROR_WRONG_PAGEURL",
+    "errorDescription": "Both 'url' and 'sitekey' are required"
+})
+_ERR_WRONG_CAPTCHA_ID = orjson.dumps({
+    "errorId": 1,
+    "errorCode": "ERROR_WRONG_CAPTCHA_ID",
+    "errorDescription": "Invalid task ID/Request parameter"
+})
+_ERR_TASK_NOT_FOUND = orjson.dumps({
+    "errorId": 1,
+    "errorCode": "ERROR_CAPTCHA_UNSOLVABLE",
+    "errorDescription": "Task not found"
+})
+_ERR_UNSOLVABLE = orjson.dumps({
+    "errorId": 1,
+    "errorCode": "ERROR_CAPTCHA_UNSOLVABLE",
+    "errorDescription": "Workers could not solve the Captcha"
+})
+_STATUS_PROCESSING = orjson.dumps({"status": "processing"})
+_ERR_NO_SLOT = orjson.dumps({
+    "errorId": 1,
+    "errorCode": "ERROR_NO_SLOT_AVAILABLE",
+    "errorDescription": "All solver slots are busy, retry later"
+})
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Quart JSON provider backed by orjson (used by jsonify and request JSON parsing)."""
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=self.default).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+def _static_json(body: bytes) -> Response:
+    """Wrap a pre-serialized JSON body in a 200 response."""
+    return Response(body, status=200, content_type="application/json")
+
+
+def _route_host_allowed(url: str) -> bool:
+    host = urlsplit(url).hostname or ''
+    return host in ROUTE_ALLOWED_HOSTS or host.endswith(ROUTE_ALLOWED_HOST_SUFFIX)
+
+
+def _origin(url: str) -> Optional[str]:
+    """scheme://host[:port] of an http(s) URL, or None."""
+    parts = urlsplit(url)
+    if parts.scheme in ('http', 'https') and parts.netloc:
+        return f"{parts.scheme}://{parts.netloc}"
+    return None
+
+
+def _parse_proxy(line: str) -> Optional[dict]:
+    """Parse a proxies.txt line into a Playwright ``proxy`` option; None if the format is invalid.
+
+    Accepted formats: ``scheme://user:pass@ip:port``, ``scheme:ip:port:user:pass`` and ``scheme://ip:port``.
+    """
+    if '@' in line:
+        try:
+            scheme_part, auth_part = line.split('://')
+            auth, address = auth_part.split('@')
+            username, password = auth.split(':')
+            ip, port = address.split(':')
+        except ValueError:
+            return None
+        return {"server": f"{scheme_part}://{ip}:{port}", "username": username, "password": password}
+
+    parts = line.split(':')
+    if len(parts) == 5:
+        proxy_scheme, proxy_ip, proxy_port, proxy_user, proxy_pass = parts
+        return {"server": f"{proxy_scheme}://{proxy_ip}:{proxy_port}", "username": proxy_user, "password": proxy_pass}
+    if len(parts) == 3:
+        return {"server": line}
+    return None
+
 
 class TurnstileAPIServer:
 
-    def __init__(self, headless: bool, useragent: Optional[str], debug: bool, browser_type: str, thread: int, proxy_support: bool, use_random_config: bool = False, browser_name: Optional[str] = None, browser_version: Optional[str] = None):
+    def __init__(self, headless: bool, useragent: Optional[str], debug: bool, browser_type: str, thread: int, proxy_support: bool, use_random_config: bool = False, browser_name: Optional[str] = None, browser_version: Optional[str] = None, headless_mode: str = "old"):
         self.app = Quart(__name__)
+        self.app.json = OrjsonProvider(self.app)
         self.debug = debug
         self.browser_type = browser_type
         self.headless = headless
+        self.headless_mode = headless_mode
         self.thread_count = thread
         self.proxy_support = proxy_support
+        # Free slot indices; per-slot state lives in the _slot_* dicts below, keyed by index.
         self.browser_pool = asyncio.Queue()
         self.use_random_config = use_random_config
         self.browser_name = browser_name
         self.browser_version = browser_version
-        self.console = Console()
+
+        # proxies.txt is resolved against the startup working directory.
+        self._proxy_path = Path.cwd() / "proxies.txt"
+        # proxies.txt cache: (mtime, parsed proxy options); re-read only when the file changes.
+        self._proxy_cache: Optional[tuple[Optional[float], list[dict]]] = None
+        self._proxy_checked_at = 0.0
+        self._proxy_lock = asyncio.Lock()
+
+        # Shared browser and its recycling state (see _acquire_browser).
+        self._playwright = None
+        # camoufox: browser -> its AsyncCamoufox manager (each start() owns a Playwright driver)
+        self._camoufox_managers: dict = {}
+        self._launch_kwargs: dict = {}
+        self._browser = None
+        self._browser_ops = 0
+        self._browser_born = 0.0
+        self._browser_users: dict = {}
+        # Per-slot state (slot index -> value): browser config, long-lived context (or None)
+        # and the proxy options that context was created with.
+        self._slot_configs: dict = {}
+        self._slot_contexts: dict = {}
+        self._slot_proxy: dict = {}
+        self._recycle_lock = asyncio.Lock()
+        # Admitted solve tasks (see SOLVE_QUEUE_PER_SLOT); also keeps them referenced until done.
+        self._solve_tasks: set = set()
         
         # Initialize useragent and sec_ch_ua attributes
         self.useragent = useragent
@@ -101,15 +440,55 @@ class TurnstileAPIServer:
                 self.browser_version = version
                 self.useragent = useragent
                 self.sec_ch_ua = sec_ch_ua
-        
-        self.browser_args = []
-        if self.useragent:
-            self.browser_args.append(f"--user-agent={self.useragent}")
+
 
         self._setup_routes()
 
+    async def _get_proxies(self) -> list[dict]:
+        """Return the parsed proxies from proxies.txt, cached by file mtime."""
+        if self._proxy_cache is not None and time.monotonic() - self._proxy_checked_at < PROXY_RECHECK_SECONDS:
+            return self._proxy_cache[1]
+
+        async with self._proxy_lock:
+            if self._proxy_cache is not None and time.monotonic() - self._proxy_checked_at < PROXY_RECHECK_SECONDS:
+                return self._proxy_cache[1]
+
+            self._proxy_checked_at = time.monotonic()
+            try:
+                mtime = self._proxy_path.stat().st_mtime
+            except FileNotFoundError:
+                self._proxy_cache = (None, [])
+                raise
+
+            if self._proxy_cache is None or self._proxy_cache[0] != mtime:
+                text = await asyncio.to_thread(self._proxy_path.read_text)
+                proxies = []
+                for line in text.splitlines():
+                    line = line.strip()
+                    if not line:
+                        continue
+                    parsed = _parse_proxy(line)
+                    if parsed is None:
+                        logger.warning(f"Invalid proxy format, skipped: {line}")
+                    else:
+                        proxies.append(parsed)
+                self._proxy_cache = (mtime, proxies)
+            return self._proxy_cache[1]
+
+    @cached_property
+    def console(self):
+        from rich.console import Console
+
+        return Console()
+
     def display_welcome(self):
         """Displays welcome screen with logo."""
+        # rich is only needed for the banner; import it here to keep module import light.
+        from rich.panel import Panel
+        from rich.text import Text
+        from rich.align import Align
+        from rich import box
+
         self.console.clear()
         
         combined_text = Text()
@@ -172,15 +551,11 @@ class TurnstileAPIServer:
 
     async def _initialize_browser(self) -> None:
         """Initialize the browser and create the page pool."""
-        playwright = None
-        camoufox = None
-
         if self.browser_type in ['chromium', 'chrome', 'msedge']:
-            playwright = await async_playwright().start()
+            self._playwright = await async_playwright().start()
         elif self.browser_type == "camoufox":
             if AsyncCamoufox is None:
                 raise RuntimeError("camoufox is not installed. Please install camoufox or use --browser_type chromium.")
-            camoufox = AsyncCamoufox(headless=self.headless)
 
         browser_configs = []
         for _ in range(self.thread_count):
@@ -208,43 +583,63 @@ class TurnstileAPIServer:
                 sec_ch_ua = getattr(self, 'sec_ch_ua', '')
 
             
+            # new_context() options for this slot; _solve_turnstile only overlays the proxy.
+            context_options = {"user_agent": useragent}
+            if sec_ch_ua and sec_ch_ua.strip():
+                context_options['extra_http_headers'] = {'sec-ch-ua': sec_ch_ua}
+            if self.browser_type in ['chromium', 'chrome', 'msedge']:
+                # Viewport is set at context creation instead of a set_viewport_size call per solve.
+                context_options['viewport'] = {"width": 500, "height": 100}
+
             browser_configs.append({
                 'browser_name': browser,
                 'browser_version': version,
                 'useragent': useragent,
-                'sec_ch_ua': sec_ch_ua
+                'sec_ch_ua': sec_ch_ua,
+                'context_options': context_options,
+                # Per-slot RNG for proxy picking, independent of the module-level random state.
+                'rng': random.Random(os.urandom(8)),
             })
 
+        # One browser process is shared by all pool slots. Every solve already opens its own
+        # context (per-solve proxy, user agent and sec-ch-ua), so slots stay isolated and the
+        # user agent is never set at the process level.
+        browser_args = [
+            "--window-position=0,0",
+            "--force-device-scale-factor=1"
+        ]
+        if self.browser_type in ['chromium', 'chrome', 'msedge']:
+            browser_args.extend(CHROMIUM_LEAN_ARGS)
+            if self.headless:
+                browser_args.extend(CHROMIUM_HEADLESS_ARGS)
+            if CHROMIUM_NO_SANDBOX:
+                browser_args.extend(CHROMIUM_NO_SANDBOX_ARGS)
+
+        self._launch_kwargs = {
+            "headless": self.headless,
+            "args": browser_args,
+        }
+        # Only pass `channel` for branded browsers. Playwright's bundled Chromium does not use channel.
+        if self.browser_type in ["chrome", "msedge"]:
+            self._launch_kwargs["channel"] = self.browser_type
+        elif self.browser_type == "chromium" and self.headless and self.headless_mode == "new":
+            # Bundled Chromium runs the lightweight headless shell ("old" headless) by default;
+            # channel="chromium" is Playwright's opt-in to the heavier new headless mode.
+            self._launch_kwargs["channel"] = "chromium"
+        browser = await self._launch_browser()
+
         for i in range(self.thread_count):
             config = browser_configs[i]
-            
-            browser_args = [
-                "--window-position=0,0",
-                "--force-device-scale-factor=1"
-            ]
-            if config['useragent']:
-                browser_args.append(f"--user-agent={config['useragent']}")
-            
-            browser = None
-            if self.browser_type in ['chromium', 'chrome', 'msedge'] and playwright:
-                launch_kwargs = {
-                    "headless": self.headless,
-                    "args": browser_args,
-                }
-                # Only pass `channel` for branded browsers. Playwright's bundled Chromium does not use channel.
-                if self.browser_type in ["chrome", "msedge"]:
-                    launch_kwargs["channel"] = self.browser_type
-                browser = await playwright.chromium.launch(**launch_kwargs)
-            elif self.browser_type == "camoufox" and camoufox:
-                browser = await camoufox.start()
 
             if browser:
-                await self.browser_pool.put((i+1, browser, config))
+                self._slot_configs[i + 1] = config
+                self._slot_contexts[i + 1] = None
+                await self.browser_pool.put(i + 1)
 
             if self.debug:
                 logger.info(f"Browser {i + 1} initialized successfully with {config['browser_name']} {config['browser_version']}")
 
-        logger.info(f"Browser pool initialized with {self.browser_pool.qsize()} browsers")
+        logger.info(f"Browser pool initialized with {self.browser_pool.qsize()} slots sharing one browser")
         
         if self.use_random_config:
             logger.info(f"Each browser in pool received random configuration")
@@ -259,6 +654,69 @@ class TurnstileAPIServer:
                 logger.debug(f"Browser {i+1} User-Agent: {config['useragent']}")
                 logger.debug(f"Browser {i+1} Sec-CH-UA: {config['sec_ch_ua']}")
 
+    async def _launch_browser(self):
+        """Launch the shared browser and reset its recycling counters."""
+        browser = None
+        if self.browser_type in ['chromium', 'chrome', 'msedge'] and self._playwright:
+            browser = await self._playwright.chromium.launch(**self._launch_kwargs)
+        elif self.browser_type == "camoufox" and AsyncCamoufox is not None:
+            manager = AsyncCamoufox(headless=self.headless)
+            browser = await manager.start()
+            self._camoufox_managers[browser] = manager
+
+        self._browser = browser
+        self._browser_ops = 0
+        self._browser_born = time.monotonic()
+        return browser
+
+    async def _acquire_browser(self):
+        """Return the shared browser for one solve, relaunching it when it is worn out or disconnected.
+
+        A replaced browser is closed by _release_browser once its last in-flight solve finishes.
+        """
+        browser = self._browser
+        if (
+            self._browser_ops >= BROWSER_POOL_RECYCLE_AFTER
+            or time.monotonic() - self._browser_born > BROWSER_POOL_MAX_AGE
+            or (hasattr(browser, 'is_connected') and not browser.is_connected())
+        ):
+            async with self._recycle_lock:
+                if self._browser is browser:
+                    logger.info(f"Recycling shared browser after {self._browser_ops} solves")
+                    await self._launch_browser()
+                    if not self._browser_users.get(browser):
+                        await self._close_browser(browser)
+            browser = self._browser
+
+        self._browser_ops += 1
+        self._browser_users[browser] = self._browser_users.get(browser, 0) + 1
+        return browser
+
+    async def _release_browser(self, browser) -> None:
+        """Drop one solve's hold on ``browser``; close it if it was replaced and is now idle."""
+        users = self._browser_users.get(browser, 0) - 1
+        if users > 0:
+            self._browser_users[browser] = users
+            return
+        self._browser_users.pop(browser, None)
+        if browser is not self._browser:
+            await self._close_browser(browser)
+
+    async def _close_browser(self, browser) -> None:
+        try:
+            await browser.close()
+        except Exception as e:
+            if self.debug:
+                logger.warning(f"Error closing retired browser: {str(e)}")
+        # Stop the Playwright driver that AsyncCamoufox started for this browser.
+        manager = self._camoufox_managers.pop(browser, None)
+        if manager is not None:
+            try:
+                await manager.__aexit__(None, None, None)
+            except Exception as e:
+                if self.debug:
+                    logger.warning(f"Error stopping camoufox driver: {str(e)}")
+
     async def _periodic_cleanup(self):
         """Periodic cleanup of old results every hour"""
         while True:
@@ -270,48 +728,66 @@ class TurnstileAPIServer:
             except Exception as e:
                 logger.error(f"Error during periodic cleanup: {e}")
 
-    async def _antishadow_inject(self, page):
-        await page.add_init_script("""
-          (function() {
-            const originalAttachShadow = Element.prototype.attachShadow;
-            Element.prototype.attachShadow = function(init) {
-              const shadow = originalAttachShadow.call(this, init);
-              if (init.mode === 'closed') {
-                window.__lastClosedShadowRoot = shadow;
-              }
-              return shadow;
-            };
-          })();
-        """)
-
-
-
     async def _optimized_route_handler(self, route):
         """Оптимизированный обработчик маршрутов для экономии ресурсов."""
-        url = route.request.url
-        resource_type = route.request.resource_type
-
-        allowed_types = {'document', 'script', 'xhr', 'fetch'}
-
-        allowed_domains = [
-            'challenges.cloudflare.com',
-            'static.cloudflareinsights.com',
-            'cloudflare.com'
-        ]
-        
-        if resource_type in allowed_types:
+        request = route.request
+        if request.resource_type in ROUTE_ALLOWED_TYPES or _route_host_allowed(request.url):
             await route.continue_()
-        elif any(domain in url for domain in allowed_domains):
-            await route.continue_() 
         else:
             await route.abort()
 
+    async def _reset_context_storage(self, page, url: str) -> bool:
+        """Wipe what a solve left in the context so the slot can reuse it for another site.
+
+        Clears all storage types (cookies, local/session storage, IndexedDB, cache storage,
+        service workers) of every origin the solve touched, plus the HTTP cache. Needs CDP,
+        so only Chromium contexts are reused; returns False when the context must be discarded.
+        """
+        if self.browser_type not in ['chromium', 'chrome', 'msedge']:
+            return False
+        origins = {origin for origin in map(_origin, (url, page.url)) if origin}
+        origins.update(CONTEXT_RESET_ORIGINS)
+        client = await page.context.new_cdp_session(page)
+        try:
+            for origin in origins:
+                await client.send('Storage.clearDataForOrigin', {'origin': origin, 'storageTypes': 'all'})
+            await client.send('Network.clearBrowserCache')
+        finally:
+            with suppress(Exception):
+                await client.detach()
+        return True
+
     async def _block_rendering(self, page):
-        """Блокировка рендеринга для экономии ресурсов"""
+        """Блокировка рендеринга для экономии ресурсов.
+
+        Chromium: CDP Fetch pauses only image/stylesheet/font/media requests, so documents,
+        scripts and XHR never reach Python; returns the CDP session.
+        Other browsers: Python route handler for every request, returns None.
+        """
+        if self.browser_type in ['chromium', 'chrome', 'msedge']:
+            client = await page.context.new_cdp_session(page)
+
+            async def on_request_paused(event):
+                request_id = event['requestId']
+                with suppress(Exception):
+                    if _route_host_allowed(event['request']['url']):
+                        await client.send('Fetch.continueRequest', {'requestId': request_id})
+                    else:
+                        await client.send('Fetch.failRequest', {'requestId': request_id, 'errorReason': 'BlockedByClient'})
+
+            client.on('Fetch.requestPaused', on_request_paused)
+            await client.send('Fetch.enable', {'patterns': CDP_FETCH_PATTERNS})
+            return client
         await page.route("**/*", self._optimized_route_handler)
+        return None
 
-    async def _unblock_rendering(self, page):
+    async def _unblock_rendering(self, page, client=None):
         """Разблокировка рендеринга"""
+        if client is not None:
+            # Fetch.disable releases any request still paused
+            await client.send('Fetch.disable')
+            await client.detach()
+            return
         await page.unroute("**/*", self._optimized_route_handler)
 
     async def _find_turnstile_elements(self, page, index: int):
@@ -325,24 +801,20 @@ class TurnstileAPIServer:
             'div[class*="turnstile"]'
         ]
         
+        # Все селекторы проверяются за один page.evaluate
+        try:
+            counts = await page.evaluate(COUNT_SELECTORS_JS, selectors)
+        except Exception as e:
+            if self.debug:
+                logger.debug(f"Browser {index}: Selector count failed: {str(e)}")
+            return []
+
         elements = []
-        for selector in selectors:
-            try:
-                # Безопасная проверка count()
-                try:
-                    count = await page.locator(selector).count()
-                except Exception:
-                    # Если count() дает ошибку, пропускаем этот селектор
-                    continue
-                    
-                if count > 0:
-                    elements.append((selector, count))
-                    if self.debug:
-                        logger.debug(f"Browser {index}: Found {count} elements with selector '{selector}'")
-            except Exception as e:
+        for selector, count in zip(selectors, counts):
+            if count > 0:
+                elements.append((selector, count))
                 if self.debug:
-                    logger.debug(f"Browser {index}: Selector '{selector}' failed: {str(e)}")
-                continue
+                    logger.debug(f"Browser {index}: Found {count} elements with selector '{selector}'")
         
         return elements
 
@@ -357,24 +829,18 @@ class TurnstileAPIServer:
             ]
             
             iframe_locator = None
-            for selector in iframe_selectors:
-                try:
-                    test_locator = page.locator(selector).first
-                    # Безопасная проверка count для iframe
-                    try:
-                        iframe_count = await test_locator.count()
-                    except Exception:
-                        iframe_count = 0
-                        
-                    if iframe_count > 0:
-                        iframe_locator = test_locator
-                        if self.debug:
-                            logger.debug(f"Browser {index}: Found Turnstile iframe with selector: {selector}")
-                        break
-                except Exception as e:
+            try:
+                iframe_counts = await page.evaluate(COUNT_SELECTORS_JS, iframe_selectors)
+            except Exception as e:
+                iframe_counts = []
+                if self.debug:
+                    logger.debug(f"Browser {index}: Iframe selector count failed: {str(e)}")
+            for selector, iframe_count in zip(iframe_selectors, iframe_counts):
+                if iframe_count > 0:
+                    iframe_locator = page.locator(selector).first
                     if self.debug:
-                        logger.debug(f"Browser {index}: Iframe selector '{selector}' failed: {str(e)}")
-                    continue
+                        logger.debug(f"Browser {index}: Found Turnstile iframe with selector: {selector}")
+                    break
             
             if iframe_locator:
                 try:
@@ -431,10 +897,29 @@ class TurnstileAPIServer:
         return False
 
     async def _try_click_strategies(self, page, index: int):
+        # Клики по селекторам делает Playwright (доверенные события мыши), но отсутствующие
+        # элементы отсеиваются заранее одним page.evaluate, без ожидания таймаута на каждом.
+        selector_clicks = [
+            ('direct_widget', '.cf-turnstile'),
+            ('iframe_click', 'iframe[src*="turnstile"]'),
+        ]
+        present = {}
+
+        async def _click_if_present(selector: str):
+            if not present:
+                try:
+                    counts = await page.evaluate(COUNT_SELECTORS_JS, [sel for _, sel in selector_clicks])
+                except Exception:
+                    counts = [1] * len(selector_clicks)
+                present.update(zip((sel for _, sel in selector_clicks), counts))
+            if not present.get(selector):
+                return False
+            return await self._safe_click(page, selector, index)
+
         strategies = [
             ('checkbox_click', lambda: self._find_and_click_checkbox(page, index)),
-            ('direct_widget', lambda: self._safe_click(page, '.cf-turnstile', index)),
-            ('iframe_click', lambda: self._safe_click(page, 'iframe[src*="turnstile"]', index)),
+            ('direct_widget', lambda: _click_if_present('.cf-turnstile')),
+            ('iframe_click', lambda: _click_if_present('iframe[src*="turnstile"]')),
             ('js_click', lambda: page.evaluate("document.querySelector('.cf-turnstile')?.click()")),
             ('sitekey_attr', lambda: self._safe_click(page, '[data-sitekey]', index)),
             ('any_turnstile', lambda: self._safe_click(page, '*[class*="turnstile"]', index)),
@@ -455,6 +940,16 @@ class TurnstileAPIServer:
         
         return False
 
+    async def _click_until_solved(self, page, index: int, max_clicks: int = 10):
+        """Periodically run the click strategies while the token wait is pending (cancelled on finish)."""
+        for click_count in range(1, max_clicks + 1):
+            await asyncio.sleep(SOLVE_CLICK_INTERVAL)
+            click_success = await self._try_click_strategies(page, index)
+            if click_success and self.debug:
+                logger.debug(f"Browser {index}: Click successful (click #{click_count}/{max_clicks})")
+            elif not click_success and self.debug:
+                logger.debug(f"Browser {index}: All click strategies failed (click #{click_count}/{max_clicks})")
+
     async def _safe_click(self, page, selector: str, index: int):
         """Полностью безопасный клик с максимальной защитой от ошибок"""
         try:
@@ -470,115 +965,7 @@ class TurnstileAPIServer:
 
     async def _inject_captcha_directly(self, page, websiteKey: str, action: str = '', cdata: str = '', index: int = 0):
         """Inject CAPTCHA directly into the target website"""
-        script = f"""
-        // Remove any existing turnstile widgets first
-        document.querySelectorAll('.cf-turnstile').forEach(el => el.remove());
-        document.querySelectorAll('[data-sitekey]').forEach(el => el.remove());
-        
-        // Create turnstile widget directly on the page
-        const captchaDiv = document.createElement('div');
-        captchaDiv.className = 'cf-turnstile';
-        captchaDiv.setAttribute('data-sitekey', '{websiteKey}');
-        captchaDiv.setAttribute('data-callback', 'onTurnstileCallback');
-        {f'captchaDiv.setAttribute("data-action", "{action}");' if action else ''}
-        {f'captchaDiv.setAttribute("data-cdata", "{cdata}");' if cdata else ''}
-        captchaDiv.style.position = 'fixed';
-        captchaDiv.style.top = '20px';
-        captchaDiv.style.left = '20px';
-        captchaDiv.style.zIndex = '9999';
-        captchaDiv.style.backgroundColor = 'white';
-        captchaDiv.style.padding = '15px';
-        captchaDiv.style.border = '2px solid #0f79af';
-        captchaDiv.style.borderRadius = '8px';
-        captchaDiv.style.boxShadow = '0 4px 12px rgba(0, 0, 0, 0.3)';
-        
-        // Add to body immediately
-        document.body.appendChild(captchaDiv);
-        
-        // Load Turnstile script and render widget
-        const loadTurnstile = () => {{
-            const script = document.createElement('script');
-            script.src = 'https://challenges.cloudflare.com/turnstile/v0/api.js';
-            script.async = true;
-            script.defer = true;
-            script.onload = function() {{
-                console.log('Turnstile script loaded');
-                // Wait a bit for script to initialize
-                setTimeout(() => {{
-                    if (window.turnstile && window.turnstile.render) {{
-                        try {{
-                            window.turnstile.render(captchaDiv, {{
-                                sitekey: '{websiteKey}',
-                                {f'action: "{action}",' if action else ''}
-                                {f'cdata: "{cdata}",' if cdata else ''}
-                                callback: function(token) {{
-                                    console.log('Turnstile solved with token:', token);
-                                    // Create hidden input for token
-                                    let tokenInput = document.querySelector('input[name="cf-turnstile-response"]');
-                                    if (!tokenInput) {{
-                                        tokenInput = document.createElement('input');
-                                        tokenInput.type = 'hidden';
-                                        tokenInput.name = 'cf-turnstile-response';
-                                        document.body.appendChild(tokenInput);
-                                    }}
-                                    tokenInput.value = token;
-                                }},
-                                'error-callback': function(error) {{
-                                    console.log('Turnstile error:', error);
-                                }}
-                            }});
-                        }} catch (e) {{
-                            console.log('Turnstile render error:', e);
-                        }}
-                    }} else {{
-                        console.log('Turnstile API not available');
-                    }}
-                }}, 1000);
-            }};
-            script.onerror = function() {{
-                console.log('Failed to load Turnstile script');
-            }};
-            document.head.appendChild(script);
-        }};
-        
-        // Check if Turnstile is already loaded
-        if (window.turnstile) {{
-            console.log('Turnstile already loaded, rendering immediately');
-            try {{
-                window.turnstile.render(captchaDiv, {{
-                    sitekey: '{websiteKey}',
-                    {f'action: "{action}",' if action else ''}
-                    {f'cdata: "{cdata}",' if cdata else ''}
-                    callback: function(token) {{
-                        console.log('Turnstile solved with token:', token);
-                        let tokenInput = document.querySelector('input[name="cf-turnstile-response"]');
-                        if (!tokenInput) {{
-                            tokenInput = document.createElement('input');
-                            tokenInput.type = 'hidden';
-                            tokenInput.name = 'cf-turnstile-response';
-                            document.body.appendChild(tokenInput);
-                        }}
-                        tokenInput.value = token;
-                    }},
-                    'error-callback': function(error) {{
-                        console.log('Turnstile error:', error);
-                    }}
-                }});
-            }} catch (e) {{
-                console.log('Immediate render error:', e);
-                loadTurnstile();
-            }}
-        }} else {{
-            loadTurnstile();
-        }}
-        
-        // Setup global callback
-        window.onTurnstileCallback = function(token) {{
-            console.log('Global turnstile callback executed:', token);
-        }};
-        """
-
-        await page.evaluate(script)
+        await page.evaluate(INJECT_CAPTCHA_CALL_JS, [websiteKey, action or '', cdata or ''])
         if self.debug:
             logger.debug(f"Browser {index}: Injected CAPTCHA directly into website with sitekey: {websiteKey}")
 
@@ -586,152 +973,82 @@ class TurnstileAPIServer:
         """Solve the Turnstile challenge."""
         proxy = None
 
-        index, browser, browser_config = await self.browser_pool.get()
+        index = await self.browser_pool.get()
+        browser_config = self._slot_configs[index]
+        context = self._slot_contexts[index]
         
         try:
-            if hasattr(browser, 'is_connected') and not browser.is_connected():
-                if self.debug:
-                    logger.warning(f"Browser {index}: Browser disconnected, skipping")
-                await self.browser_pool.put((index, browser, browser_config))
-                await save_result(task_id, "turnstile", {"value": "CAPTCHA_FAIL", "elapsed_time": 0})
-                return
+            browser = await self._acquire_browser()
         except Exception as e:
-            if self.debug:
-                logger.warning(f"Browser {index}: Cannot check browser state: {str(e)}")
+            logger.error(f"Browser {index}: Cannot launch browser: {str(e)}")
+            await self.browser_pool.put(index)
+            await save_result(task_id, "turnstile", {"value": "CAPTCHA_FAIL", "elapsed_time": 0})
+            return
 
-        if self.proxy_support:
-            proxy_file_path = os.path.join(os.getcwd(), "proxies.txt")
+        context_options = browser_config['context_options']
 
+        if self.proxy_support:
             try:
-                with open(proxy_file_path) as proxy_file:
-                    proxies = [line.strip() for line in proxy_file if line.strip()]
+                proxies = await self._get_proxies()
 
-                proxy = random.choice(proxies) if proxies else None
+                # The slot keeps its proxy while it is still listed, so its context can be reused;
+                # a new one is drawn when the context is discarded (e.g. after a failed solve).
+                pinned = self._slot_proxy.get(index)
+                if context is not None and pinned in proxies:
+                    proxy = pinned
+                else:
+                    proxy = browser_config['rng'].choice(proxies) if proxies else None
                 
                 if self.debug and proxy:
-                    logger.debug(f"Browser {index}: Selected proxy: {proxy}")
+                    logger.debug(f"Browser {index}: Selected proxy: {proxy['server']}")
                 elif self.debug and not proxy:
                     logger.debug(f"Browser {index}: No proxies available")
                     
             except FileNotFoundError:
-                logger.warning(f"Proxy file not found: {proxy_file_path}")
+                logger.warning(f"Proxy file not found: {self._proxy_path}")
                 proxy = None
             except Exception as e:
                 logger.error(f"Error reading proxy file: {str(e)}")
                 proxy = None
 
             if proxy:
-                if '@' in proxy:
-                    try:
-                        scheme_part, auth_part = proxy.split('://')
-                        auth, address = auth_part.split('@')
-                        username, password = auth.split(':')
-                        ip, port = address.split(':')
-                        if self.debug:
-                            logger.debug(f"Browser {index}: Creating context with proxy {scheme_part}://{ip}:{port} (auth: {username}:***)")
-                        context_options = {
-                            "proxy": {
-                                "server": f"{scheme_part}://{ip}:{port}",
-                                "username": username,
-                                "password": password
-                            },
-                            "user_agent": browser_config['useragent']
-                        }
-                        
-                        if browser_config['sec_ch_ua'] and browser_config['sec_ch_ua'].strip():
-                            context_options['extra_http_headers'] = {
-                                'sec-ch-ua': browser_config['sec_ch_ua']
-                            }
-                        
-                        context = await browser.new_context(**context_options)
-                    except ValueError:
-                        raise ValueError(f"Invalid proxy format: {proxy}")
-                else:
-                    parts = proxy.split(':')
-                    if len(parts) == 5:
-                        proxy_scheme, proxy_ip, proxy_port, proxy_user, proxy_pass = parts
-                        if self.debug:
-                            logger.debug(f"Browser {index}: Creating context with proxy {proxy_scheme}://{proxy_ip}:{proxy_port} (auth: {proxy_user}:***)")
-                        context_options = {
-                            "proxy": {
-                                "server": f"{proxy_scheme}://{proxy_ip}:{proxy_port}",
-                                "username": proxy_user,
-                                "password": proxy_pass
-                            },
-                            "user_agent": browser_config['useragent']
-                        }
-                        
-                        if browser_config['sec_ch_ua'] and browser_config['sec_ch_ua'].strip():
-                            context_options['extra_http_headers'] = {
-                                'sec-ch-ua': browser_config['sec_ch_ua']
-                            }
-                        
-                        context = await browser.new_context(**context_options)
-                    elif len(parts) == 3:
-                        if self.debug:
-                            logger.debug(f"Browser {index}: Creating context with proxy {proxy}")
-                        context_options = {
-                            "proxy": {"server": f"{proxy}"},
-                            "user_agent": browser_config['useragent']
-                        }
-                        
-                        if browser_config['sec_ch_ua'] and browser_config['sec_ch_ua'].strip():
-                            context_options['extra_http_headers'] = {
-                                'sec-ch-ua': browser_config['sec_ch_ua']
-                            }
-                        
-                        context = await browser.new_context(**context_options)
-                    else:
-                        raise ValueError(f"Invalid proxy format: {proxy}")
-            else:
                 if self.debug:
-                    logger.debug(f"Browser {index}: Creating context without proxy")
-                context_options = {"user_agent": browser_config['useragent']}
-                
-                if browser_config['sec_ch_ua'] and browser_config['sec_ch_ua'].strip():
-                    context_options['extra_http_headers'] = {
-                        'sec-ch-ua': browser_config['sec_ch_ua']
-                    }
-                
+                    auth = f" (auth: {proxy['username']}:***)" if "username" in proxy else ""
+                    logger.debug(f"Browser {index}: Creating context with proxy {proxy['server']}{auth}")
+                context_options = {**context_options, "proxy": proxy}
+            elif self.debug:
+                logger.debug(f"Browser {index}: Creating context without proxy")
+
+        # The slot keeps its context between solves (Chromium only, see _reset_context_storage);
+        # it is rebuilt when the shared browser was recycled or the slot's proxy changed.
+        if context is not None and (context.browser is not browser or self._slot_proxy.get(index) != proxy):
+            with suppress(Exception):
+                await context.close()
+            context = None
+
+        page = None
+        start_time = time.time()
+
+        try:
+            if context is None:
                 context = await browser.new_context(**context_options)
-        else:
-            context_options = {"user_agent": browser_config['useragent']}
-            
-            if browser_config['sec_ch_ua'] and browser_config['sec_ch_ua'].strip():
-                context_options['extra_http_headers'] = {
-                    'sec-ch-ua': browser_config['sec_ch_ua']
-                }
-            
-            context = await browser.new_context(**context_options)
+                self._slot_proxy[index] = proxy
 
-        page = await context.new_page()
-        
-        await self._antishadow_inject(page)
-        
-        await self._block_rendering(page)
-        
-        await page.add_init_script("""
-        Object.defineProperty(navigator, 'webdriver', {
-            get: () => undefined,
-        });
-        
-        window.chrome = {
-            runtime: {},
-            loadTimes: function() {},
-            csi: function() {},
-        };
-        """)
+                # Registered on the context before the page exists: one call covers the page
+                # init scripts and the widget injector.
+                await context.add_init_script(CONTEXT_INIT_JS)
+            else:
+                # Переиспользуем контекст слота — сбрасываем состояние предыдущего решения
+                await asyncio.gather(context.clear_cookies(), context.clear_permissions())
+
+            page = await context.new_page()
         
-        if self.browser_type in ['chromium', 'chrome', 'msedge']:
-            await page.set_viewport_size({"width": 500, "height": 100})
-            if self.debug:
-                logger.debug(f"Browser {index}: Set viewport size to 500x240")
+            cdp_client = await self._block_rendering(page)
 
-        start_time = time.time()
+            start_time = time.time()
 
-        try:
             if self.debug:
-                logger.debug(f"Browser {index}: Starting Turnstile solve for URL: {url} with Sitekey: {sitekey} | Action: {action} | Cdata: {cdata} | Proxy: {proxy}")
+                logger.debug(f"Browser {index}: Starting Turnstile solve for URL: {url} with Sitekey: {sitekey} | Action: {action} | Cdata: {cdata} | Proxy: {proxy['server'] if proxy else None}")
                 logger.debug(f"Browser {index}: Setting up optimized page loading with resource blocking")
 
             if self.debug:
@@ -739,7 +1056,7 @@ class TurnstileAPIServer:
 
             await page.goto(url, wait_until='domcontentloaded', timeout=30000)
 
-            await self._unblock_rendering(page)
+            await self._unblock_rendering(page, cdp_client)
 
             # Сразу инъектируем виджет Turnstile на целевой сайт
             if self.debug:
@@ -747,77 +1064,45 @@ class TurnstileAPIServer:
             
             await self._inject_captcha_directly(page, sitekey, action or '', cdata or '', index)
             
-            # Ждем время для загрузки и рендеринга виджета
-            await asyncio.sleep(3)
-
             locator = page.locator('input[name="cf-turnstile-response"]')
-            max_attempts = 30
-            click_count = 0
-            max_clicks = 10
 
-            for attempt in range(max_attempts):
-                try:
-                    # Безопасная проверка количества элементов с токеном
+            # Ждем появления поля ответа виджета (вместо фиксированной паузы 3 с)
+            try:
+                await locator.first.wait_for(state='attached', timeout=5000)
+            except Exception:
+                if self.debug:
+                    logger.debug(f"Browser {index}: Turnstile response field not attached after 5s, polling anyway")
+
+            # Ожидание токена выполняется в браузере (wait_for_function), клики идут параллельно
+            deadline = time.monotonic() + SOLVE_POLL_BUDGET
+            click_task = asyncio.create_task(self._click_until_solved(page, index))
+            token = None
+            try:
+                while token is None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
                     try:
-                        count = await locator.count()
+                        handle = await page.wait_for_function(
+                            TOKEN_VALUE_JS, polling=SOLVE_POLL_INTERVAL_MS, timeout=remaining * 1000
+                        )
+                        token = await handle.json_value()
                     except Exception as e:
+                        # Таймаут или пересоздание контекста страницы (навигация) — повторяем до дедлайна
                         if self.debug:
-                            logger.debug(f"Browser {index}: Locator count failed on attempt {attempt + 1}: {str(e)}")
-                        count = 0
-
-                    if count == 0:
-                        if self.debug and attempt % 5 == 0:
-                            logger.debug(f"Browser {index}: No token elements found on attempt {attempt + 1}")
-                    elif count == 1:
-                        # Если только один элемент, проверяем его токен
-                        try:
-                            token = await locator.input_value(timeout=500)
-                            if token:
-                                elapsed_time = round(time.time() - start_time, 3)
-                                logger.success(f"Browser {index}: Successfully solved captcha - {COLORS.get('MAGENTA')}{token[:10]}{COLORS.get('RESET')} in {COLORS.get('GREEN')}{elapsed_time}{COLORS.get('RESET')} Seconds")
-                                await save_result(task_id, "turnstile", {"value": token, "elapsed_time": elapsed_time})
-                                return
-                        except Exception as e:
-                            if self.debug:
-                                logger.debug(f"Browser {index}: Single token element check failed: {str(e)}")
-                    else:
-                        # Если несколько элементов, проверяем все по очереди
-                        if self.debug:
-                            logger.debug(f"Browser {index}: Found {count} token elements, checking all")
-
-                        for i in range(count):
-                            try:
-                                element_token = await locator.nth(i).input_value(timeout=500)
-                                if element_token:
-                                    elapsed_time = round(time.time() - start_time, 3)
-                                    logger.success(f"Browser {index}: Successfully solved captcha - {COLORS.get('MAGENTA')}{element_token[:10]}{COLORS.get('RESET')} in {COLORS.get('GREEN')}{elapsed_time}{COLORS.get('RESET')} Seconds")
-                                    await save_result(task_id, "turnstile", {"value": element_token, "elapsed_time": elapsed_time})
-                                    return
-                            except Exception as e:
-                                if self.debug:
-                                    logger.debug(f"Browser {index}: Token element {i} check failed: {str(e)}")
-                                continue
-
-                    if attempt > 2 and attempt % 3 == 0 and click_count < max_clicks:
-                        click_success = await self._try_click_strategies(page, index)
-                        click_count += 1
-                        if click_success and self.debug:
-                            logger.debug(f"Browser {index}: Click successful (click #{click_count}/{max_clicks})")
-                        elif not click_success and self.debug:
-                            logger.debug(f"Browser {index}: All click strategies failed on attempt {attempt + 1} (click #{click_count}/{max_clicks})")
-
-                    # Адаптивное ожидание
-                    wait_time = min(0.5 + (attempt * 0.05), 2.0)
-                    await asyncio.sleep(wait_time)
-
-                    if self.debug and attempt % 5 == 0:
-                        logger.debug(f"Browser {index}: Attempt {attempt + 1}/{max_attempts} - Waiting for token (clicks: {click_count}/{max_clicks})")
+                            logger.debug(f"Browser {index}: Token wait interrupted: {str(e)}")
+                        await asyncio.sleep(max(0.0, min(0.2, deadline - time.monotonic())))
+            finally:
+                click_task.cancel()
+                with suppress(asyncio.CancelledError, Exception):
+                    await click_task
+
+            if token:
+                elapsed_time = round(time.time() - start_time, 3)
+                logger.success(f"Browser {index}: Successfully solved captcha - {COLORS.get('MAGENTA')}{token[:10]}{COLORS.get('RESET')} in {COLORS.get('GREEN')}{elapsed_time}{COLORS.get('RESET')} Seconds")
+                await save_result(task_id, "turnstile", {"value": token, "elapsed_time": elapsed_time})
+                return
 
-                except Exception as e:
-                    if self.debug:
-                        logger.debug(f"Browser {index}: Attempt {attempt + 1} error: {str(e)}")
-                    continue
-            
             elapsed_time = round(time.time() - start_time, 3)
             await save_result(task_id, "turnstile", {"value": "CAPTCHA_FAIL", "elapsed_time": elapsed_time})
             if self.debug:
@@ -827,29 +1112,51 @@ class TurnstileAPIServer:
             await save_result(task_id, "turnstile", {"value": "CAPTCHA_FAIL", "elapsed_time": elapsed_time})
             if self.debug:
                 logger.error(f"Browser {index}: Error solving Turnstile: {str(e)}")
+            # Контекст мог остаться в неизвестном состоянии — не переиспользуем его
+            if context is not None:
+                with suppress(Exception):
+                    await context.close()
+                context = None
         finally:
             if self.debug:
-                logger.debug(f"Browser {index}: Closing browser context and cleaning up")
-            
-            try:
-                await context.close()
-                if self.debug:
-                    logger.debug(f"Browser {index}: Context closed successfully")
-            except Exception as e:
-                if self.debug:
-                    logger.warning(f"Browser {index}: Error closing context: {str(e)}")
+                logger.debug(f"Browser {index}: Closing page and cleaning up")
+
+            # Сбрасываем хранилища посещённых origin, иначе контекст не переиспользуем
+            if context is not None:
+                reusable = False
+                if page is not None:
+                    try:
+                        reusable = await self._reset_context_storage(page, url)
+                    except Exception as e:
+                        if self.debug:
+                            logger.warning(f"Browser {index}: Error clearing context storage: {str(e)}")
+                if not reusable:
+                    with suppress(Exception):
+                        await context.close()
+                    context = None
             
             try:
-                if hasattr(browser, 'is_connected') and browser.is_connected():
-                    await self.browser_pool.put((index, browser, browser_config))
+                if page is not None:
+                    await page.close()
                     if self.debug:
-                        logger.debug(f"Browser {index}: Browser returned to pool")
-                else:
-                    if self.debug:
-                        logger.warning(f"Browser {index}: Browser disconnected, not returning to pool")
+                        logger.debug(f"Browser {index}: Page closed successfully")
             except Exception as e:
                 if self.debug:
-                    logger.warning(f"Browser {index}: Error returning browser to pool: {str(e)}")
+                    logger.warning(f"Browser {index}: Error closing page: {str(e)}")
+                if context is not None:
+                    with suppress(Exception):
+                        await context.close()
+                    context = None
+
+            # The slot always returns to the pool; a disconnected browser is relaunched on next acquire.
+            # A context on a browser that has since been replaced is dropped (the old browser closes it).
+            await self._release_browser(browser)
+            if context is not None and browser is not self._browser:
+                context = None
+            self._slot_contexts[index] = context
+            await self.browser_pool.put(index)
+            if self.debug:
+                logger.debug(f"Browser {index}: Browser returned to pool")
 
 
 
@@ -864,13 +1171,12 @@ class TurnstileAPIServer:
         cdata = request.args.get('cdata')
 
         if not url or not sitekey:
-            return jsonify({
-                "errorId": 1,
-                "errorCode": "ERROR_WRONG_PAGEURL",
-                "errorDescription": "Both 'url' and 'sitekey' are required"
-            }), 200
+            return _static_json(_ERR_WRONG_PAGEURL)
 
-        task_id = str(uuid.uuid4())
+        if len(self._solve_tasks) >= self.thread_count * SOLVE_QUEUE_PER_SLOT:
+            return _static_json(_ERR_NO_SLOT)
+
+        task_id = secrets.token_hex(16)
         await save_result(task_id, "turnstile", {
             "status": "CAPTCHA_NOT_READY",
             "createTime": int(time.time()),
@@ -881,7 +1187,9 @@ class TurnstileAPIServer:
         })
 
         try:
-            asyncio.create_task(self._solve_turnstile(task_id=task_id, url=url, sitekey=sitekey, action=action, cdata=cdata))
+            task = asyncio.create_task(self._solve_turnstile(task_id=task_id, url=url, sitekey=sitekey, action=action, cdata=cdata))
+            self._solve_tasks.add(task)
+            task.add_done_callback(self._solve_tasks.discard)
 
             if self.debug:
                 logger.debug(f"Request completed with taskid {task_id}.")
@@ -902,29 +1210,22 @@ class TurnstileAPIServer:
         task_id = request.args.get('id')
 
         if not task_id:
-            return jsonify({
-                "errorId": 1,
-                "errorCode": "ERROR_WRONG_CAPTCHA_ID",
-                "errorDescription": "Invalid task ID/Request parameter"
-            }), 200
+            return _static_json(_ERR_WRONG_CAPTCHA_ID)
 
-        result = await load_result(task_id)
+        # Optional long-poll: ?wait=N holds the request until the task leaves "processing" (at most N seconds).
+        wait = request.args.get('wait', default=0.0, type=float) or 0.0
+        if wait > 0:
+            result = await wait_result(task_id, min(wait, RESULT_WAIT_MAX))
+        else:
+            result = await load_result(task_id)
         if not result:
-            return jsonify({
-                "errorId": 1,
-                "errorCode": "ERROR_CAPTCHA_UNSOLVABLE",
-                "errorDescription": "Task not found"
-            }), 200
+            return _static_json(_ERR_TASK_NOT_FOUND)
 
         if result == "CAPTCHA_NOT_READY" or (isinstance(result, dict) and result.get("status") == "CAPTCHA_NOT_READY"):
-            return jsonify({"status": "processing"}), 200
+            return _static_json(_STATUS_PROCESSING)
 
         if isinstance(result, dict) and result.get("value") == "CAPTCHA_FAIL":
-            return jsonify({
-                "errorId": 1,
-                "errorCode": "ERROR_CAPTCHA_UNSOLVABLE",
-                "errorDescription": "Workers could not solve the Captcha"
-            }), 200
+            return _static_json(_ERR_UNSOLVABLE)
 
         if isinstance(result, dict) and result.get("value") and result.get("value") != "CAPTCHA_FAIL":
             return jsonify({
@@ -935,11 +1236,7 @@ class TurnstileAPIServer:
                 }
             }), 200
         else:
-            return jsonify({
-                "errorId": 1,
-                "errorCode": "ERROR_CAPTCHA_UNSOLVABLE",
-                "errorDescription": "Workers could not solve the Captcha"
-            }), 200
+            return _static_json(_ERR_UNSOLVABLE)
 
     
 
@@ -1012,13 +1309,14 @@ def parse_args():
     parser.add_argument('--random', action='store_true', help='Use random User-Agent and Sec-CH-UA configuration from pool')
     parser.add_argument('--browser', type=str, help='Specify browser name to use (e.g., chrome, firefox)')
     parser.add_argument('--version', type=str, help='Specify browser version to use (e.g., 139, 141)')
+    parser.add_argument('--headless_mode', type=str, default='old', choices=['old', 'new'], help='Headless implementation for bundled chromium: old (headless shell, much lower memory) or new (full browser, closer to headed Chrome). Branded chrome/msedge always use new headless (default: old)')
     parser.add_argument('--host', type=str, default='0.0.0.0', help='Specify the IP address where the API solver runs. (Default: 127.0.0.1)')
     parser.add_argument('--port', type=str, default='5072', help='Set the port for the API solver to listen on. (Default: 5072)')
     return parser.parse_args()
 
 
-def create_app(headless: bool, useragent: str, debug: bool, browser_type: str, thread: int, proxy_support: bool, use_random_config: bool, browser_name: str, browser_version: str) -> Quart:
-    server = TurnstileAPIServer(headless=headless, useragent=useragent, debug=debug, browser_type=browser_type, thread=thread, proxy_support=proxy_support, use_random_config=use_random_config, browser_name=browser_name, browser_version=browser_version)
+def create_app(headless: bool, useragent: str, debug: bool, browser_type: str, thread: int, proxy_support: bool, use_random_config: bool, browser_name: str, browser_version: str, headless_mode: str = "old") -> Quart:
+    server = TurnstileAPIServer(headless=headless, useragent=useragent, debug=debug, browser_type=browser_type, thread=thread, proxy_support=proxy_support, use_random_config=use_random_config, browser_name=browser_name, browser_version=browser_version, headless_mode=headless_mode)
     return server.app
 
 
@@ -1042,6 +1340,7 @@ if __name__ == '__main__':
             proxy_support=args.proxy,
             use_random_config=args.random,
             browser_name=args.browser,
-            browser_version=args.version
+            browser_version=args.version,
+            headless_mode=args.headless_mode
         )
         app.run(host=args.host, port=int(args.port))
@@ -1,17 +1,33 @@
 import random
+from functools import lru_cache
+
+_RANDOM_VERSIONS = ("120.0.0.0", "121.0.0.0", "122.0.0.0", "124.0.0.0")
+
+
+@lru_cache(maxsize=128)
+def _random_config_strings(ver):
+    # (User-Agent, Sec-CH-UA)，版本集合很小，按版本缓存
+    major = ver.split(".")[0]
+    ua = f"Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{ver} Safari/537.36"
+    sec_ch_ua = f'"Not(A:Brand";v="99", "Google Chrome";v="{major}", "Chromium";v="{major}"'
+    return ua, sec_ch_ua
+
+
+@lru_cache(maxsize=128)
+def _named_config_strings(version):
+    ua = f"Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{version} Safari/537.36"
+    sec_ch_ua = f'"Google Chrome";v="{version}", "Chromium";v="{version}"'
+    return ua, sec_ch_ua
+
 
 class browser_config:
     @staticmethod
     def get_random_browser_config(browser_type):
         # 返回: 浏览器名, 版本, User-Agent, Sec-CH-UA
-        versions = ["120.0.0.0", "121.0.0.0", "122.0.0.0", "124.0.0.0"]
-        ver = random.choice(versions)
-        ua = f"Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{ver} Safari/537.36"
-        sec_ch_ua = f'"Not(A:Brand";v="99", "Google Chrome";v="{ver.split(".")[0]}", "Chromium";v="{ver.split(".")[0]}"'
+        ver = random.choice(_RANDOM_VERSIONS)
+        ua, sec_ch_ua = _random_config_strings(ver)
         return "chrome", ver, ua, sec_ch_ua
 
     @staticmethod
     def get_browser_config(name, version):
-        ua = f"Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{version} Safari/537.36"
-        sec_ch_ua = f'"Google Chrome";v="{version}", "Chromium";v="{version}"'
-        return ua, sec_ch_ua
\ No newline at end of file
+        return _named_config_strings(version)
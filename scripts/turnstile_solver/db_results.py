@@ -1,27 +1,131 @@
+import os
+import orjson
 import time
 import asyncio
+from collections import OrderedDict
 
 # 内存数据库，用于临时存储验证码结果
-results_db = {}
+# task_id -> (写入时间 monotonic, 结果)；按最后写入顺序排列，过期/超量淘汰都从头部进行
+results_db = OrderedDict()
+
+# 结果保留上限与有效期
+RESULTS_MAX_ENTRIES = 100_000
+RESULTS_TTL_SECONDS = 7 * 86400
+
+# 可选的共享 Redis 存储：设置后多个 solver 进程可以通过任意进程的 /result 查询结果
+RESULTS_REDIS_URL = os.getenv("TURNSTILE_RESULTS_REDIS_URL", "")
+RESULTS_REDIS_PREFIX = "turnstile:result:"
+_redis = None
+
+# 长轮询：task_id -> [结果就绪事件, 等待者数量]（事件仅由本进程内的 save_result 触发）
+_result_events = {}
+
+
+def _evict_expired(max_age, now):
+    """从头部弹出过期条目，遇到第一个未过期的即停止"""
+    removed = 0
+    cutoff = now - max_age
+    while results_db:
+        written_at, _ = next(iter(results_db.values()))
+        if written_at > cutoff:
+            break
+        results_db.popitem(last=False)
+        removed += 1
+    return removed
+
+
+def _is_pending(data):
+    return data == "CAPTCHA_NOT_READY" or (isinstance(data, dict) and data.get("status") == "CAPTCHA_NOT_READY")
+
+
+def _notify(task_id, data):
+    if not _is_pending(data):
+        entry = _result_events.pop(task_id, None)
+        if entry is not None:
+            entry[0].set()
+
 
 async def init_db():
+    global _redis
+    if RESULTS_REDIS_URL:
+        try:
+            from redis import asyncio as aioredis
+        except ImportError:
+            raise ImportError("需要安装 redis 包: pip install redis")
+        _redis = aioredis.from_url(RESULTS_REDIS_URL)
+        await _redis.ping()
+        print("[系统] 结果数据库初始化成功 (Redis 模式)")
+        return
     print("[系统] 结果数据库初始化成功 (内存模式)")
 
 async def save_result(task_id, task_type, data):
     # 存储结果，如果 data 是字典则存入，否则构造字典
-    results_db[task_id] = data
+    if _redis is not None:
+        # Redis 按 key 过期，无需手动淘汰
+        await _redis.set(RESULTS_REDIS_PREFIX + task_id, orjson.dumps(data), ex=RESULTS_TTL_SECONDS)
+        _notify(task_id, data)
+        print(f"[系统] 任务 {task_id} 状态更新: {data.get('value', '正在处理')}")
+        return
+    now = time.monotonic()
+    results_db[task_id] = (now, data)
+    results_db.move_to_end(task_id)
+    _evict_expired(RESULTS_TTL_SECONDS, now)
+    while len(results_db) > RESULTS_MAX_ENTRIES:
+        results_db.popitem(last=False)
+    _notify(task_id, data)
     print(f"[系统] 任务 {task_id} 状态更新: {data.get('value', '正在处理')}")
 
 async def load_result(task_id):
-    return results_db.get(task_id)
+    if _redis is not None:
+        raw = await _redis.get(RESULTS_REDIS_PREFIX + task_id)
+        return orjson.loads(raw) if raw else None
+    entry = results_db.get(task_id)
+    if entry is None:
+        return None
+    written_at, data = entry
+    if time.monotonic() - written_at > RESULTS_TTL_SECONDS:
+        return None
+    return data
 
 async def cleanup_old_results(days_old=7):
-    # 简单的清理逻辑
-    now = time.time()
-    to_delete = []
-    for tid, res in results_db.items():
-        if isinstance(res, dict) and now - res.get('createTime', now) > days_old * 86400:
-            to_delete.append(tid)
-    for tid in to_delete:
-        del results_db[tid]
-    return len(to_delete)
\ No newline at end of file
+    if _redis is not None:
+        return 0
+    # 条目按写入时间有序，只需处理已过期的头部
+    return _evict_expired(days_old * 86400, time.monotonic())
+
+async def wait_result(task_id, timeout):
+    """等待任务离开处理中状态（最多 timeout 秒），返回最新结果"""
+    deadline = time.monotonic() + timeout
+    entry = None
+    try:
+        while True:
+            result = await load_result(task_id)
+            remaining = deadline - time.monotonic()
+            if not _is_pending(result) or remaining <= 0:
+                return result
+            current = _result_events.get(task_id)
+            if current is None or current is not entry:
+                # 首次等待，或上一个事件已被 save_result 触发并移除
+                if current is None:
+                    current = _result_events[task_id] = [asyncio.Event(), 0]
+                current[1] += 1
+                _release_waiter(task_id, entry)
+                entry = current
+            # Redis 模式下结果可能由其他进程写入，本进程的事件收不到，因此每秒重新检查一次
+            if _redis is not None:
+                remaining = min(remaining, 1.0)
+            try:
+                await asyncio.wait_for(entry[0].wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        # 结果由其他进程写入或任务始终未完成时，由最后一个等待者移除事件
+        _release_waiter(task_id, entry)
+
+
+def _release_waiter(task_id, entry):
+    if entry is None:
+        return
+    entry[1] -= 1
+    if entry[1] <= 0 and _result_events.get(task_id) is entry:
+        del _result_events[task_id]
@@ -0,0 +1,134 @@
+import asyncio
+
+import orjson
+import pytest
+
+from app.core import storage as storage_mod
+from app.core.storage import LocalStorage
+
+
+@pytest.fixture
+def local(tmp_path, monkeypatch):
+    token_file = tmp_path / "token.json"
+    monkeypatch.setattr(storage_mod, "TOKEN_FILE", token_file)
+    monkeypatch.setattr(storage_mod, "TOKEN_DELTA_FILE", token_file.with_suffix(".jsonl"))
+    monkeypatch.setattr(storage_mod, "TOKEN_DELTA_OLD_FILE", token_file.with_suffix(".jsonl.old"))
+    monkeypatch.setattr(storage_mod, "TOKEN_TEMP_FILE", token_file.with_suffix(".tmp"))
+    return LocalStorage()
+
+
+def _delta(pool, token, **fields):
+    data = {"token": token, **fields}
+    return pool, data, orjson.dumps(data)
+
+
+def _tokens(data, pool):
+    return {t["token"]: t for t in data.get(pool, [])}
+
+
+def test_deltas_replay_over_snapshot(local):
+    async def run():
+        await local.save_tokens({"ssoBasic": [{"token": "a", "quota": 1}]})
+        await local.save_token_deltas([_delta("ssoBasic", "a", quota=2), _delta("ssoBasic", "b", quota=5)])
+        await local.save_token_deltas([_delta("ssoBasic", "a", quota=3), _delta("ssoSuper", "c", quota=7)])
+        return await local.load_tokens()
+
+    data = asyncio.run(run())
+    assert [t["token"] for t in data["ssoBasic"]] == ["a", "b"]
+    assert _tokens(data, "ssoBasic")["a"]["quota"] == 3
+    assert _tokens(data, "ssoSuper")["c"]["quota"] == 7
+
+
+def test_partial_delta_line_is_skipped(local):
+    async def run():
+        await local.save_tokens({"ssoBasic": [{"token": "a", "quota": 1}]})
+        await local.save_token_deltas([_delta("ssoBasic", "a", quota=2)])
+        with open(storage_mod.TOKEN_DELTA_FILE, "ab") as f:
+            f.write(b'{"pool":"ssoBasic","token":"a","da')
+        return await local.load_tokens()
+
+    assert _tokens(asyncio.run(run()), "ssoBasic")["a"]["quota"] == 2
+
+
+def test_full_save_rotates_deltas(local):
+    async def run():
+        await local.save_token_deltas([_delta("ssoBasic", "a", quota=1)])
+        await local.save_tokens({"ssoBasic": [{"token": "a", "quota": 9}]})
+        return await local.load_tokens()
+
+    data = asyncio.run(run())
+    assert _tokens(data, "ssoBasic")["a"]["quota"] == 9
+    assert not storage_mod.TOKEN_DELTA_FILE.exists()
+    assert not storage_mod.TOKEN_DELTA_OLD_FILE.exists()
+    assert not storage_mod.TOKEN_TEMP_FILE.exists()
+
+
+def test_compaction_merges_log_into_snapshot(local, monkeypatch):
+    monkeypatch.setattr(LocalStorage, "DELTA_COMPACT_MIN_BYTES", 16)
+
+    async def run():
+        await local.save_tokens({"ssoBasic": [{"token": "a", "quota": 1}]})
+        for quota in range(2, 12):
+            await local.save_token_deltas([_delta("ssoBasic", "a", quota=quota)])
+        return await local.load_tokens()
+
+    data = asyncio.run(run())
+    assert _tokens(data, "ssoBasic")["a"]["quota"] == 11
+    assert not storage_mod.TOKEN_DELTA_OLD_FILE.exists()
+    assert not storage_mod.TOKEN_TEMP_FILE.exists()
+    # 快照只有一种格式：紧凑 JSON
+    snapshot = storage_mod.TOKEN_FILE.read_bytes()
+    assert snapshot == orjson.dumps(orjson.loads(snapshot))
+
+
+def test_crash_before_snapshot_replace_replays_old_log(local):
+    async def run():
+        await local.save_tokens({"ssoBasic": [{"token": "a", "quota": 1}]})
+        await local.save_token_deltas([_delta("ssoBasic", "a", quota=2), _delta("ssoBasic", "b", quota=4)])
+        # 模拟压缩在轮转日志之后、替换快照之前中断
+        storage_mod.TOKEN_TEMP_FILE.write_bytes(b'{"ssoBasic":[{"tok')
+        storage_mod.TOKEN_DELTA_FILE.replace(storage_mod.TOKEN_DELTA_OLD_FILE)
+        recovered = await local.load_tokens()
+
+        # 重启后的新增量接在旧日志之后，下一次保存一并合并
+        await local.save_token_deltas([_delta("ssoBasic", "a", quota=3)])
+        replayed = await local.load_tokens()
+        await local.save_tokens(replayed)
+        return recovered, replayed, await local.load_tokens()
+
+    recovered, replayed, final = asyncio.run(run())
+    assert _tokens(recovered, "ssoBasic")["a"]["quota"] == 2
+    assert _tokens(recovered, "ssoBasic")["b"]["quota"] == 4
+    assert _tokens(replayed, "ssoBasic")["a"]["quota"] == 3
+    assert final == replayed
+    assert not storage_mod.TOKEN_DELTA_OLD_FILE.exists()
+    assert not storage_mod.TOKEN_TEMP_FILE.exists()
+
+
+def test_crash_after_snapshot_replace_ignores_stale_old_log(local, monkeypatch):
+    stale = orjson.dumps({"pool": "ssoBasic", "token": "a", "data": {"token": "a", "quota": 2}}) + b"\n"
+
+    async def run():
+        await local.save_tokens({"ssoBasic": [{"token": "a", "quota": 5}]})
+        # 模拟快照已替换、但 .old 尚未删除时中断：.old 内容已包含在快照中
+        storage_mod.TOKEN_DELTA_OLD_FILE.write_bytes(stale)
+        recovered = await local.load_tokens()
+
+        # 下一次保存又在替换快照前中断时，过期的 .old 也不能被回放
+        await local.save_token_deltas([_delta("ssoBasic", "a", quota=6)])
+        real_replace = storage_mod.os.replace
+
+        def failing_replace(src, dst):
+            if dst == storage_mod.TOKEN_FILE:
+                raise OSError("crash")
+            real_replace(src, dst)
+
+        monkeypatch.setattr(storage_mod.os, "replace", failing_replace)
+        with pytest.raises(storage_mod.StorageError):
+            await local.save_tokens({"ssoBasic": [{"token": "a", "quota": 6}]})
+        monkeypatch.setattr(storage_mod.os, "replace", real_replace)
+        return recovered, await local.load_tokens()
+
+    recovered, final = asyncio.run(run())
+    assert _tokens(recovered, "ssoBasic")["a"]["quota"] == 5
+    assert _tokens(final, "ssoBasic")["a"]["quota"] == 6